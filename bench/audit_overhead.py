@@ -0,0 +1,96 @@
+"""Write-path cost of the audit trail.
+
+Times receipt writes with the audit listener detached and attached, on the
+same throwaway database: one commit per update (the API path), batches of 500
+updates per commit (bulk approval and jobs), and inserts. Rounds alternate
+between the two settings, and the median of each is reported.
+
+    python bench/audit_overhead.py --receipts 20000 --rounds 5
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from common import make_app
+from src.models.receipt import db, Receipt
+from src.models.audit import AuditLog, record_audit
+
+BATCH_SIZE = 500
+
+
+def single_updates(ids):
+    for receipt_id in ids:
+        receipt = db.session.get(Receipt, receipt_id)
+        receipt.amount += 1
+        db.session.commit()
+
+
+def batched_updates(ids):
+    for start in range(0, len(ids), BATCH_SIZE):
+        for receipt in Receipt.query.filter(Receipt.id.in_(ids[start:start + BATCH_SIZE])):
+            receipt.approved = not receipt.approved
+            receipt.approved_by = 'bench'
+            receipt.bank_amount += 1
+        db.session.commit()
+
+
+def inserts(numbers):
+    for start in range(0, len(numbers), BATCH_SIZE):
+        for number in numbers[start:start + BATCH_SIZE]:
+            db.session.add(Receipt(number=number, client_name='عميل', amount=100, bank_amount=100, method='شبكة',
+                                   bank='الراجحي', reason='سداد فواتير', branch='الرياض', created_by='bench',
+                                   date=date(2025, 3, 1)))
+        db.session.commit()
+
+
+def timed(func, items):
+    start = time.perf_counter()
+    func(items)
+    return (time.perf_counter() - start) / len(items) * 1000
+
+
+def run(receipts, rounds, single):
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        with app.app_context():
+            inserts(list(range(1, receipts + 1)))
+            ids = [receipt_id for (receipt_id,) in db.session.query(Receipt.id).order_by(Receipt.id)]
+            next_number = receipts + 1
+
+            results = {False: {}, True: {}}
+            for _ in range(rounds):
+                for audited in (False, True):
+                    if audited:
+                        event.listen(Session, 'after_flush', record_audit)
+                    else:
+                        event.remove(Session, 'after_flush', record_audit)
+                    numbers = list(range(next_number, next_number + 2000))
+                    next_number += 2000
+                    for name, func, items in (('single commit', single_updates, ids[:single]),
+                                              ('batched update', batched_updates, ids),
+                                              ('batched insert', inserts, numbers)):
+                        results[audited].setdefault(name, []).append(timed(func, items))
+            event.listen(Session, 'after_flush', record_audit)
+            audit_rows = AuditLog.query.count()
+
+    print(f'{receipts} receipts, {rounds} rounds, ms per row (median)')
+    print(f"{'operation':<16} {'audit off':>10} {'audit on':>10} {'overhead':>10}")
+    for name in results[False]:
+        off = statistics.median(results[False][name])
+        on = statistics.median(results[True][name])
+        print(f'{name:<16} {off:>10.3f} {on:>10.3f} {on - off:>+10.3f}')
+    print(f'{audit_rows} audit rows written')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--single', type=int, default=500, help='updates in the one-commit-per-update run')
+    args = parser.parse_args()
+    run(args.receipts, args.rounds, args.single)
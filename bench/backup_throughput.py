@@ -0,0 +1,123 @@
+"""Online backup throughput on a multi-GB database under write load.
+
+Builds a throwaway database of receipts carrying base64 attachments until it
+reaches the requested size, then measures a writer thread that commits one
+receipt at a time through the ORM: first on its own, then while a snapshot is
+taken. Reports the manifest figures (copy throughput, compression time) and
+the writer's commit latency in each phase.
+
+    python bench/backup_throughput.py --size-gb 2
+"""
+import argparse
+import base64
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+
+from common import make_app
+from src.models.receipt import db, Receipt
+from src.services.backup import BackupService
+
+ROWS_PER_TRANSACTION = 2000
+
+
+def build(path, size_bytes, attachment_kb):
+    """Fill the receipts table with raw inserts until the file reaches size_bytes."""
+    # Random bytes, base64 encoded like the attachments the frontend uploads; gzip
+    # cannot shrink them much, so compression time is not flattered
+    attachment = 'data:image/jpeg;base64,' + base64.b64encode(os.urandom(attachment_kb * 768)).decode()
+    conn = sqlite3.connect(path)
+    number = 0
+    started = time.monotonic()
+    while os.path.getsize(path) < size_bytes:
+        rows = [(number + i, 'عميل', 100.0, 100.0, 'تحويل بنكي', 'الراجحي', 'سداد فواتير', 'الرياض', '[]',
+                 'bench', '2025-03-01', attachment) for i in range(ROWS_PER_TRANSACTION)]
+        number += ROWS_PER_TRANSACTION
+        with conn:
+            conn.executemany(
+                'INSERT INTO receipts (number, client_name, amount, bank_amount, method, bank, reason, branch, '
+                'invoices, created_by, date, attachment, approved) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                rows)
+    conn.close()
+    print(f'built {os.path.getsize(path) / 2 ** 30:.2f} GB ({number} receipts) in {time.monotonic() - started:.0f}s')
+    return number
+
+
+class Writer(threading.Thread):
+    """Commits one receipt per iteration and records (finish time, latency)."""
+
+    def __init__(self, app, first_number):
+        super().__init__(daemon=True)
+        self.app = app
+        self.number = first_number
+        self.samples = []
+        self.stop = threading.Event()
+
+    def run(self):
+        with self.app.app_context():
+            while not self.stop.is_set():
+                started = time.monotonic()
+                db.session.add(Receipt(number=self.number, client_name='عميل', amount=50, bank_amount=50,
+                                       method='نقداً', bank='الراجحي', reason='سداد فواتير', branch='جدة',
+                                       created_by='bench', date=date(2025, 3, 2)))
+                db.session.commit()
+                finished = time.monotonic()
+                self.samples.append((finished, finished - started))
+                self.number += 1
+                time.sleep(0.001)
+            db.session.remove()
+
+
+def latency_line(label, samples, seconds):
+    if not samples:
+        return f'{label:<14} no commits'
+    ms = sorted(latency * 1000 for _, latency in samples)
+    pick = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]
+    return (f'{label:<14} {len(ms):>6} commits {len(ms) / max(seconds, 1e-6):>7.1f}/s  '
+            f'p50 {statistics.median(ms):6.2f}  p95 {pick(0.95):6.2f}  p99 {pick(0.99):7.2f}  max {ms[-1]:7.2f} ms')
+
+
+def run(size_gb, attachment_kb, baseline_seconds, directory):
+    app = make_app(directory, BACKUP_DIR=os.path.join(directory, 'backups'), BACKUP_INTERVAL=0)
+    service = BackupService(app)
+    count = build(service.db_path, int(size_gb * 2 ** 30), attachment_kb)
+
+    writer = Writer(app, count)
+    writer.start()
+    time.sleep(baseline_seconds)
+    backup_started = time.monotonic()
+    manifest = service.create_snapshot()
+    backup_finished = time.monotonic()
+    writer.stop.set()
+    writer.join()
+
+    copy_finished = backup_started + manifest['copySeconds']
+    baseline = [s for s in writer.samples if s[0] < backup_started]
+    copying = [s for s in writer.samples if backup_started <= s[0] < copy_finished]
+    compressing = [s for s in writer.samples if copy_finished <= s[0] <= backup_finished]
+
+    print(f"snapshot {manifest['dbSize'] / 2 ** 30:.2f} GB -> {manifest['compressedSize'] / 2 ** 30:.2f} GB gz")
+    print(f"copy {manifest['copySeconds']:.1f}s ({manifest['throughputMBps']} MB/s), "
+          f"total with gzip + sha256 {manifest['totalSeconds']:.1f}s")
+    print(latency_line('no backup', baseline, baseline_seconds))
+    print(latency_line('during copy', copying, manifest['copySeconds']))
+    print(latency_line('during gzip', compressing, backup_finished - copy_finished))
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-gb', type=float, default=2)
+    parser.add_argument('--attachment-kb', type=int, default=64, help='attachment size per receipt')
+    parser.add_argument('--baseline', type=float, default=5, help='seconds of writes before the backup')
+    parser.add_argument('--dir', help='where to build the database (default: a temporary directory)')
+    args = parser.parse_args()
+    if args.dir:
+        run(args.size_gb, args.attachment_kb, args.baseline, args.dir)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            run(args.size_gb, args.attachment_kb, args.baseline, directory)
@@ -0,0 +1,42 @@
+"""Throwaway app setup shared by the benchmark scripts."""
+import json
+import os
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db, User
+from src.models.receipt import SystemLists
+from src.routes.user import user_bp
+from src.routes.receipt import receipt_bp
+from src.routes.sync import sync_bp
+from src.routes.audit import audit_bp
+
+
+def make_app(directory, **config):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'app.db')}",
+                      SECRET_KEY='bench', **config)
+    for blueprint in (user_bp, receipt_bp, sync_bp, audit_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+        db.session.add(SystemLists(list_type='banks', items=json.dumps(['الراجحي'])))
+        db.session.commit()
+    return app
+
+
+def add_users(app, branches):
+    """Create users per branch from {branch: count}; returns {branch: [usernames]}."""
+    users = {}
+    with app.app_context():
+        for branch, count in branches.items():
+            users[branch] = [f'{branch}-{i}' for i in range(count)]
+            for username in users[branch]:
+                db.session.add(User(username=username, code=username, password='x', role='فرعي', branch=branch))
+        db.session.commit()
+    return users
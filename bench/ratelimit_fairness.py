@@ -0,0 +1,76 @@
+"""Load test for the per-branch rate limits.
+
+Several branches hit the API at once from their own threads: some with many
+users firing requests back to back, one with a single user at a modest pace.
+Every saturated branch should be served at about the same rate (its branch
+bucket), whatever its number of users, and the quiet branch should not be
+throttled at all.
+
+    python bench/ratelimit_fairness.py --duration 5
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from common import make_app, add_users
+from src.services.ratelimit import RateLimiter, DEFAULT_LIMITS
+
+
+def run(duration, noisy_users, quiet_rate, backend):
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND=backend,
+                       RATE_LIMIT_SHM_PATH=f'{directory}/buckets')
+        RateLimiter(app)
+        branches = {'noisy-large': noisy_users, 'noisy-small': max(1, noisy_users // 4), 'quiet': 1}
+        users = add_users(app, branches)
+
+        counts = {branch: {'served': 0, 'throttled': 0} for branch in branches}
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def worker(branch, username, interval):
+            client = app.test_client()
+            # The session cookie login sets is the only identity the limiter reads
+            with client.session_transaction() as session:
+                session['username'] = username
+            while time.monotonic() < deadline:
+                status = client.get('/api/lists').status_code
+                with lock:
+                    counts[branch]['served' if status == 200 else 'throttled'] += 1
+                if interval:
+                    time.sleep(interval)
+
+        threads = []
+        for branch, usernames in users.items():
+            interval = 1 / quiet_rate if branch == 'quiet' else 0
+            threads += [threading.Thread(target=worker, args=(branch, u, interval)) for u in usernames]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    rate, burst = DEFAULT_LIMITS['read']
+    ceiling = (rate * 3 * duration + burst * 3) / duration
+    print(f'{backend} backend, {duration:.0f}s, branch ceiling {ceiling:.1f} req/s')
+    print(f"{'branch':<12} {'users':>5} {'served':>7} {'req/s':>7} {'throttled':>9}")
+    for branch, count in counts.items():
+        print(f"{branch:<12} {branches[branch]:>5} {count['served']:>7} "
+              f"{count['served'] / duration:>7.1f} {count['throttled']:>9}")
+
+    saturated = [counts[b]['served'] / duration for b in ('noisy-large', 'noisy-small')]
+    # Jain's fairness index over the saturated branches: 1.0 is a perfectly even split
+    jain = sum(saturated) ** 2 / (len(saturated) * sum(x * x for x in saturated))
+    print(f'fairness index {jain:.3f}, quiet branch throttled {counts["quiet"]["throttled"]} times')
+    return jain, counts['quiet']['throttled']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--noisy-users', type=int, default=20)
+    parser.add_argument('--quiet-rate', type=float, default=8, help='requests per second from the quiet branch')
+    parser.add_argument('--backend', choices=['memory', 'shared'], default='memory')
+    args = parser.parse_args()
+    jain, quiet_throttled = run(args.duration, args.noisy_users, args.quiet_rate, args.backend)
+    raise SystemExit(0 if jain > 0.95 and quiet_throttled == 0 else 1)
@@ -7,9 +7,25 @@ from flask import Flask, send_from_directory
 from flask_cors import CORS
 from src.models.user import db, User
 from src.models.receipt import Receipt, Client, Company, SystemLists
+from src.models.sync import ChangeLog, seed_change_log
+from src.models.job import Job
+from src.models.reconciliation import BankStatement, StatementLine, ReconciliationMatch
+from src.models.audit import AuditLog
 from src.routes.user import user_bp
 from src.routes.receipt import receipt_bp
+from src.routes.admin import admin_bp
+from src.routes.sync import sync_bp
+from src.routes.jobs import jobs_bp
+from src.routes.reports import reports_bp
+from src.routes.reconciliation import reconciliation_bp
+from src.routes.audit import audit_bp
+from src.services.backup import backup_service
+from src.services.jobs import job_runner
+from src.services.ratelimit import rate_limiter
+import src.services.job_handlers  # registers the job types
 import json
+import sqlite3
+from contextlib import contextmanager
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -19,15 +35,70 @@ CORS(app)
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(receipt_bp, url_prefix='/api')
+app.register_blueprint(admin_bp, url_prefix='/api')
+app.register_blueprint(sync_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(reports_bp, url_prefix='/api')
+app.register_blueprint(reconciliation_bp, url_prefix='/api')
+app.register_blueprint(audit_bp, url_prefix='/api')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
+backup_service.init_app(app)
+job_runner.init_app(app)
+rate_limiter.init_app(app)
 
-with app.app_context():
+@contextmanager
+def startup_lock():
+    """Let one process at a time create and upgrade the schema.
+
+    Every Gunicorn worker imports this module and would otherwise run the same
+    ALTER TABLE and CREATE INDEX statements at once. An exclusive transaction on
+    a side file is the lock; SQLite drops it if the process dies.
+    """
+    database_dir = os.path.join(os.path.dirname(__file__), 'database')
+    os.makedirs(database_dir, exist_ok=True)
+    lock = sqlite3.connect(os.path.join(database_dir, '.startup.lock'), timeout=600, isolation_level=None)
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        yield
+    finally:
+        lock.close()
+
+def upgrade_schema():
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                column_type = column.type.compile(db.engine.dialect)
+                db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        db.session.commit()
+        
+        # Indexes whose definition changed are rebuilt
+        indexes = {index['name']: index['column_names'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in indexes and indexes[index.name] != [column.name for column in index.columns]:
+                index.drop(db.engine)
+                del indexes[index.name]
+            if index.name not in indexes:
+                index.create(db.engine)
+
+with app.app_context(), startup_lock():
+    # Inside the lock, so each later worker finds the schema already up to date
     db.create_all()
     
+    # create_all skips tables that already exist, so add columns and indexes introduced later
+    upgrade_schema()
+    
+    # Rows that predate the change log still have to reach branch replicas
+    seed_change_log()
+    
+    # WAL lets readers (including the backup service) run alongside the writer
+    db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+    
     # Initialize default data if database is empty
     # Create default users if none exist
     if User.query.count() == 0:
@@ -74,6 +145,9 @@ with app.app_context():
     
     db.session.commit()
 
+# Start background job workers once the tables exist
+job_runner.start()
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -0,0 +1,159 @@
+from src.models.user import db, User
+from src.models.receipt import Receipt, Company, SystemLists
+from flask import has_request_context, request, session as login_session, g
+from sqlalchemy import event, inspect, DDL
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+from datetime import datetime, date
+import json
+
+AUDITED_ENTITIES = {
+    Receipt: 'receipt',
+    User: 'user',
+    Company: 'company',
+    SystemLists: 'system_lists',
+}
+
+# Never worth a diff entry
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at'}
+
+# Recorded as changed without their values: secrets and base64 blobs
+REDACTED_FIELDS = {'password', 'attachment', 'logo', 'header', 'footer'}
+
+class AuditLog(db.Model):
+    __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_entity', 'entity', 'entity_id', 'created_at'),
+        db.Index('ix_audit_log_actor', 'actor', 'created_at'),
+        db.Index('ix_audit_log_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # receipt, user, company, system_lists
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    changes = db.Column(db.Text)  # JSON {field: [old, new]}
+    actor = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entity': self.entity,
+            'entityId': self.entity_id,
+            'action': self.action,
+            'changes': json.loads(self.changes) if self.changes else {},
+            'actor': self.actor,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+# Append-only: the database itself refuses edits and deletes of audit rows
+for operation in ('UPDATE', 'DELETE'):
+    event.listen(AuditLog.__table__, 'after_create', DDL(
+        f"CREATE TRIGGER audit_log_no_{operation.lower()} BEFORE {operation} ON audit_log "
+        f"BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END"
+    ))
+
+
+def _value(field, value):
+    if field in REDACTED_FIELDS:
+        return None if value is None else '***'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+_columns_cache = {}
+
+
+def _columns(mapper):
+    """Audited column attribute names of a mapper, computed once."""
+    columns = _columns_cache.get(mapper)
+    if columns is None:
+        columns = _columns_cache[mapper] = [attr.key for attr in mapper.column_attrs if attr.key not in IGNORED_FIELDS]
+    return columns
+
+
+def _diff(obj, action):
+    changes = {}
+    state = inspect(obj)
+    if action == 'create':
+        values = state.dict
+        for field in _columns(state.mapper):
+            value = values.get(field)
+            if value is not None:
+                changes[field] = _value(field, value)
+        return changes
+
+    # committed_state maps only the attributes set since load to their loaded
+    # values, so the diff is read straight from it without building attribute history
+    values = state.dict
+    for field, old in state.committed_state.items():
+        if field in IGNORED_FIELDS:
+            continue
+        if old is NO_VALUE:
+            old = None
+        new = values.get(field)
+        if old != new:
+            changes[field] = [_value(field, old), _value(field, new)]
+    return changes
+
+
+def _actor(session, obj, action, changes):
+    actor = session.info.get('audit_actor')
+    if not actor and has_request_context():
+        # The user the route resolved, else the login session, else the header
+        actor = g.get('audit_user') or login_session.get('username') or request.headers.get('X-User')
+    if not actor and session.info.get('sync_origin'):
+        actor = f"sync:{session.info['sync_origin']}"
+    if not actor and isinstance(obj, Receipt):
+        # Fall back to the user fields the receipt routes already receive
+        if action == 'create':
+            actor = obj.created_by
+        elif 'deleted_at' in changes:
+            actor = obj.deleted_by
+        elif 'approved' in changes:
+            actor = obj.approved_by
+    return actor
+
+
+# Rows go straight to the driver: the values are already plain strings and
+# numbers, so SQLAlchemy's per-row parameter processing is skipped
+INSERT_SQL = 'INSERT INTO audit_log (entity, entity_id, action, changes, actor, created_at) VALUES (?, ?, ?, ?, ?, ?)'
+
+
+# How SQLAlchemy's SQLite DateTime stores values
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+@event.listens_for(Session, 'after_flush')
+def record_audit(session, flush_context):
+    # Always six fraction digits, like rows SQLAlchemy writes, so created_at
+    # range filters compare as text consistently
+    now = datetime.utcnow().strftime(DATETIME_FORMAT)
+    rows = []
+    for objects, action in ((session.new, 'create'), (session.dirty, 'update'), (session.deleted, 'delete')):
+        for obj in objects:
+            entity = AUDITED_ENTITIES.get(type(obj))
+            if entity is None:
+                continue
+            changes = _diff(obj, action) if action != 'delete' else {}
+            if action == 'update' and not changes:
+                continue
+            if action == 'update' and isinstance(obj, Receipt) and 'deleted_at' in changes:
+                action_name = 'delete'
+            else:
+                action_name = action
+            rows.append((
+                entity,
+                obj.id,
+                action_name,
+                json.dumps(changes, ensure_ascii=False, separators=(',', ':')),
+                _actor(session, obj, action, changes),
+                now
+            ))
+
+    # One INSERT for the whole flush, inside the same transaction as the change
+    if rows:
+        session.connection().exec_driver_sql(INSERT_SQL, rows)
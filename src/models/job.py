@@ -0,0 +1,46 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_type', 'status', 'job_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed, cancelled
+    params = db.Column(db.Text)  # JSON object
+    progress = db.Column(db.Float, default=0)  # 0..1
+    message = db.Column(db.String(200))
+    result = db.Column(db.Text)  # JSON summary
+    result_file = db.Column(db.String(300))  # Path of a downloadable result
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    attempts = db.Column(db.Integer, default=0)
+    worker = db.Column(db.String(100))  # host:pid of the process running the job
+    created_by = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.job_type,
+            'status': self.status,
+            'params': json.loads(self.params) if self.params else {},
+            'progress': self.progress,
+            'message': self.message,
+            'result': json.loads(self.result) if self.result else None,
+            'hasFile': bool(self.result_file),
+            'error': self.error,
+            'cancelRequested': self.cancel_requested,
+            'attempts': self.attempts,
+            'createdBy': self.created_by,
+            'createdAt': self.created_at.isoformat() if self.created_at else None,
+            'startedAt': self.started_at.isoformat() if self.started_at else None,
+            'finishedAt': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -4,6 +4,10 @@ import json
 
 class Receipt(db.Model):
     __tablename__ = 'receipts'
+    __table_args__ = (
+        # Covering index for the collections report
+        db.Index('ix_receipts_report', 'date', 'branch', 'method', 'bank', 'bank_amount', 'deleted_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     number = db.Column(db.Integer, unique=True, nullable=False)
@@ -23,6 +27,8 @@ class Receipt(db.Model):
     approved = db.Column(db.Boolean, default=False)
     approved_by = db.Column(db.String(100))
     approved_at = db.Column(db.DateTime)
+    deleted_at = db.Column(db.DateTime)  # Soft delete: set instead of removing the row
+    deleted_by = db.Column(db.String(100))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -46,6 +52,8 @@ class Receipt(db.Model):
             'approved': self.approved,
             'approvedBy': self.approved_by,
             'approvedAt': self.approved_at.isoformat() if self.approved_at else None,
+            'deletedAt': self.deleted_at.isoformat() if self.deleted_at else None,
+            'deletedBy': self.deleted_by,
             'createdAt': self.created_at.isoformat() if self.created_at else None,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -0,0 +1,87 @@
+from src.models.user import db
+from datetime import datetime
+
+class BankStatement(db.Model):
+    __tablename__ = 'bank_statements'
+
+    id = db.Column(db.Integer, primary_key=True)
+    bank = db.Column(db.String(100), nullable=False)
+    filename = db.Column(db.String(200))
+    date_from = db.Column(db.Date)
+    date_to = db.Column(db.Date)
+    line_count = db.Column(db.Integer, default=0)
+    total_amount = db.Column(db.Float, default=0)
+    imported_by = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'bank': self.bank,
+            'filename': self.filename,
+            'dateFrom': self.date_from.isoformat() if self.date_from else None,
+            'dateTo': self.date_to.isoformat() if self.date_to else None,
+            'lineCount': self.line_count,
+            'totalAmount': self.total_amount,
+            'importedBy': self.imported_by,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class StatementLine(db.Model):
+    __tablename__ = 'statement_lines'
+    __table_args__ = (
+        db.Index('ix_statement_lines_statement_status', 'statement_id', 'status'),
+        # Duplicate check on import
+        db.Index('ix_statement_lines_bank_date', 'bank', 'date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    statement_id = db.Column(db.Integer, db.ForeignKey('bank_statements.id'), nullable=False)
+    bank = db.Column(db.String(100), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    reference = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    status = db.Column(db.String(20), default='unmatched')  # unmatched, proposed, matched
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'statementId': self.statement_id,
+            'bank': self.bank,
+            'date': self.date.isoformat() if self.date else None,
+            'amount': self.amount,
+            'reference': self.reference,
+            'description': self.description,
+            'status': self.status
+        }
+
+
+class ReconciliationMatch(db.Model):
+    __tablename__ = 'reconciliation_matches'
+    __table_args__ = (
+        db.Index('ix_reconciliation_matches_line', 'line_id'),
+        db.Index('ix_reconciliation_matches_receipt', 'receipt_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    line_id = db.Column(db.Integer, db.ForeignKey('statement_lines.id'), nullable=False)
+    receipt_id = db.Column(db.Integer, db.ForeignKey('receipts.id'), nullable=False)
+    amount = db.Column(db.Float, nullable=False)  # Share of the statement line covered by this receipt
+    kind = db.Column(db.String(20), nullable=False)  # exact, split
+    status = db.Column(db.String(20), default='proposed')  # proposed, confirmed, rejected
+    confirmed_by = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'lineId': self.line_id,
+            'receiptId': self.receipt_id,
+            'amount': self.amount,
+            'kind': self.kind,
+            'status': self.status,
+            'confirmedBy': self.confirmed_by,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,127 @@
+from src.models.user import db
+from src.models.receipt import Receipt, Client
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+from datetime import datetime
+import json
+
+# Entities replicated to branches, keyed by a natural key that is stable across nodes
+TRACKED_ENTITIES = {
+    Receipt: ('receipt', 'number'),
+    Client: ('client', 'client_id'),
+}
+
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('ix_change_log_entity_key', 'entity', 'entity_key'),
+        {'sqlite_autoincrement': True},
+    )
+
+    # The primary key doubles as the monotonic sync version
+    version = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # receipt, client; server for restore markers
+    entity_key = db.Column(db.String(50), nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # insert, update, delete, restore
+    data = db.Column(db.Text)  # JSON snapshot of the row, empty for deletes
+    origin = db.Column(db.String(100), default='server')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'entity': self.entity,
+            'key': self.entity_key,
+            'op': self.operation,
+            'data': json.loads(self.data) if self.data else None,
+            'origin': self.origin,
+            'createdAt': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+def latest_version():
+    return db.session.query(db.func.max(ChangeLog.version)).scalar() or 0
+
+
+def seed_change_log(batch_size=1000):
+    """Log an insert for every tracked row that has no change_log entry yet.
+
+    Rows written before the change log existed (or by bulk SQL that bypasses
+    the session) would otherwise never reach a branch replica.
+    """
+    now = datetime.utcnow()
+    seeded = 0
+    for model, (entity, key_attr) in TRACKED_ENTITIES.items():
+        key_column = getattr(model, key_attr)
+        logged = db.exists().where(
+            ChangeLog.entity == entity,
+            ChangeLog.entity_key == db.cast(key_column, db.String)
+        )
+        query = model.query.filter(~logged)
+        if hasattr(model, 'deleted_at'):
+            query = query.filter(model.deleted_at.is_(None))
+
+        rows = []
+        for obj in query.order_by(model.id).yield_per(batch_size):
+            rows.append({
+                'entity': entity,
+                'entity_key': str(getattr(obj, key_attr)),
+                'operation': 'insert',
+                'data': json.dumps(obj.to_dict(), ensure_ascii=False),
+                'origin': 'server',
+                'created_at': now
+            })
+            if len(rows) == batch_size:
+                db.session.execute(ChangeLog.__table__.insert(), rows)
+                seeded += len(rows)
+                rows = []
+        if rows:
+            db.session.execute(ChangeLog.__table__.insert(), rows)
+            seeded += len(rows)
+    db.session.commit()
+    return seeded
+
+
+def _modified(obj):
+    # Same answer as session.is_modified() for column attributes, read from
+    # committed_state instead of building history for every attribute
+    state = inspect(obj)
+    values = state.dict
+    for field, old in state.committed_state.items():
+        if (None if old is NO_VALUE else old) != values.get(field):
+            return True
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    origin = session.info.get('sync_origin', 'server')
+    now = datetime.utcnow()
+    rows = []
+
+    def add(obj, operation):
+        entity, key_attr = TRACKED_ENTITIES[type(obj)]
+        rows.append({
+            'entity': entity,
+            'entity_key': str(getattr(obj, key_attr)),
+            'operation': operation,
+            'data': json.dumps(obj.to_dict(), ensure_ascii=False) if operation != 'delete' else None,
+            'origin': origin,
+            'created_at': now
+        })
+
+    for obj in session.new:
+        if type(obj) in TRACKED_ENTITIES:
+            add(obj, 'insert')
+    for obj in session.dirty:
+        if type(obj) in TRACKED_ENTITIES and _modified(obj):
+            # Soft-deleted receipts replicate as deletes
+            add(obj, 'delete' if getattr(obj, 'deleted_at', None) is not None else 'update')
+    for obj in session.deleted:
+        if type(obj) in TRACKED_ENTITIES:
+            add(obj, 'delete')
+
+    # Written on the flush connection so the log commits or rolls back with the change
+    if rows:
+        session.connection().execute(ChangeLog.__table__.insert(), rows)
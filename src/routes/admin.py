@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from src.services.backup import backup_service, BackupError
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/admin/backup', methods=['GET'])
+def get_backup_status():
+    try:
+        return jsonify(backup_service.status())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/admin/backup', methods=['POST'])
+def start_backup():
+    try:
+        # The lock is taken here, so a backup running in another worker is
+        # reported now instead of failing later in the background
+        backup_service.start_snapshot()
+        
+        # Progress is reported by GET /admin/backup
+        return jsonify({'message': 'Backup started'}), 202
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,70 @@
+from flask import Blueprint, request, jsonify
+from src.models.audit import AuditLog, AUDITED_ENTITIES
+from datetime import datetime, timedelta
+
+audit_bp = Blueprint('audit', __name__)
+
+ENTITIES = set(AUDITED_ENTITIES.values())
+
+@audit_bp.route('/audit', methods=['GET'])
+def get_audit_log():
+    try:
+        entity = request.args.get('entity')
+        entity_id = request.args.get('entity_id', type=int)
+        actor = request.args.get('actor')
+        action = request.args.get('action')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        before = request.args.get('before', type=int)
+        limit = min(request.args.get('limit', 100, type=int), 1000)
+
+        if entity and entity not in ENTITIES:
+            return jsonify({'error': f'Invalid entity: {entity}'}), 400
+        if entity_id is not None and not entity:
+            return jsonify({'error': 'entity_id requires entity'}), 400
+
+        # Each filter combination lands on one of the audit_log indexes
+        query = AuditLog.query
+        if entity:
+            query = query.filter(AuditLog.entity == entity)
+        if entity_id is not None:
+            query = query.filter(AuditLog.entity_id == entity_id)
+        if actor:
+            query = query.filter(AuditLog.actor == actor)
+        if action:
+            query = query.filter(AuditLog.action == action)
+        if date_from:
+            query = query.filter(AuditLog.created_at >= datetime.fromisoformat(date_from))
+        if date_to:
+            end = datetime.fromisoformat(date_to)
+            if len(date_to) == 10:
+                # A bare date includes the whole day
+                end += timedelta(days=1)
+            query = query.filter(AuditLog.created_at < end)
+        if before:
+            query = query.filter(AuditLog.id < before)
+
+        # Ids grow in commit order, so they serve as both the sort and the paging cursor
+        entries = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries],
+            'hasMore': has_more,
+            'next': entries[-1].id if has_more else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@audit_bp.route('/audit/<entity>/<int:entity_id>', methods=['GET'])
+def get_entity_history(entity, entity_id):
+    try:
+        if entity not in ENTITIES:
+            return jsonify({'error': f'Invalid entity: {entity}'}), 400
+
+        entries = AuditLog.query.filter_by(entity=entity, entity_id=entity_id) \
+            .order_by(AuditLog.id).all()
+        return jsonify([entry.to_dict() for entry in entries])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
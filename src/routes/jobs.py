@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify, send_file
+from src.models.user import db
+from src.models.job import Job
+from src.services.jobs import job_runner
+import os
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        data = request.get_json()
+        
+        job_type = data.get('type')
+        if not job_type:
+            return jsonify({'error': 'Missing required field: type'}), 400
+        if job_type not in job_runner.handlers:
+            return jsonify({'error': f'Unknown job type: {job_type}'}), 400
+        
+        job = job_runner.submit(job_type, data.get('params'), data.get('createdBy'))
+        
+        return jsonify(job.to_dict()), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs', methods=['GET'])
+def get_jobs():
+    try:
+        status = request.args.get('status')
+        job_type = request.args.get('type')
+        created_by = request.args.get('created_by')
+        limit = request.args.get('limit', 50, type=int)
+        
+        query = Job.query
+        if status:
+            query = query.filter(Job.status == status)
+        if job_type:
+            query = query.filter(Job.job_type == job_type)
+        if created_by:
+            query = query.filter(Job.created_by == created_by)
+        
+        jobs = query.order_by(Job.id.desc()).limit(limit).all()
+        return jsonify([job.to_dict() for job in jobs])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        job = Job.query.get_or_404(job_id)
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/<int:job_id>/result', methods=['GET'])
+def download_job_result(job_id):
+    try:
+        job = Job.query.get_or_404(job_id)
+        if job.status != 'succeeded':
+            return jsonify({'error': f'Job is {job.status}'}), 409
+        if not job.result_file or not os.path.exists(job.result_file):
+            return jsonify({'error': 'Job has no result file'}), 404
+        
+        return send_file(job.result_file, as_attachment=True, download_name=os.path.basename(job.result_file))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    try:
+        job = Job.query.get_or_404(job_id)
+        if job.status not in ('queued', 'running'):
+            return jsonify({'error': f'Job is already {job.status}'}), 409
+        
+        job_runner.cancel(job)
+        
+        return jsonify(job.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,51 +1,66 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session, g
 from src.models.receipt import db, Receipt, Client, Company, SystemLists
 from src.models.user import User
+from src.services.ratelimit import single_flight
 from datetime import datetime, date
 import json
 
 receipt_bp = Blueprint('receipt', __name__)
 
+def filter_receipts(query, args):
+    """Apply the receipt list filters (as sent by the frontend) to a query."""
+    branch = args.get('branch')
+    method = args.get('method')
+    bank = args.get('bank')
+    reason = args.get('reason')
+    date_from = args.get('date_from')
+    date_to = args.get('date_to')
+    search = args.get('search')
+    created_by = args.get('created_by')
+    
+    query = query.filter(Receipt.deleted_at.is_(None))
+    if branch and branch != 'الكل':
+        query = query.filter(Receipt.branch == branch)
+    if method and method != 'الكل':
+        query = query.filter(Receipt.method == method)
+    if bank and bank != 'الكل':
+        query = query.filter(Receipt.bank == bank)
+    if reason and reason != 'الكل':
+        query = query.filter(Receipt.reason == reason)
+    if date_from:
+        query = query.filter(Receipt.date >= datetime.fromisoformat(date_from).date())
+    if date_to:
+        query = query.filter(Receipt.date <= datetime.fromisoformat(date_to).date())
+    if search:
+        query = query.filter(
+            db.or_(
+                Receipt.number.like(f'%{search}%'),
+                Receipt.client_id.like(f'%{search}%'),
+                Receipt.client_name.like(f'%{search}%')
+            )
+        )
+    if created_by:
+        query = query.filter(Receipt.created_by == created_by)
+    return query
+
+def request_user(data, field):
+    """Who is writing a receipt: the login session, the X-User header or the body field.
+
+    Kept on g so the audit trail records the same user.
+    """
+    g.audit_user = session.get('username') or request.headers.get('X-User') or data.get(field)
+    return g.audit_user
+
 @receipt_bp.route('/receipts', methods=['GET'])
+@single_flight
 def get_receipts():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
-        branch = request.args.get('branch')
-        method = request.args.get('method')
-        bank = request.args.get('bank')
-        reason = request.args.get('reason')
-        date_from = request.args.get('date_from')
-        date_to = request.args.get('date_to')
-        search = request.args.get('search')
-        created_by = request.args.get('created_by')
         
         # Build query
-        query = Receipt.query
-        
-        if branch and branch != 'الكل':
-            query = query.filter(Receipt.branch == branch)
-        if method and method != 'الكل':
-            query = query.filter(Receipt.method == method)
-        if bank and bank != 'الكل':
-            query = query.filter(Receipt.bank == bank)
-        if reason and reason != 'الكل':
-            query = query.filter(Receipt.reason == reason)
-        if date_from:
-            query = query.filter(Receipt.date >= datetime.fromisoformat(date_from).date())
-        if date_to:
-            query = query.filter(Receipt.date <= datetime.fromisoformat(date_to).date())
-        if search:
-            query = query.filter(
-                db.or_(
-                    Receipt.number.like(f'%{search}%'),
-                    Receipt.client_id.like(f'%{search}%'),
-                    Receipt.client_name.like(f'%{search}%')
-                )
-            )
-        if created_by:
-            query = query.filter(Receipt.created_by == created_by)
+        query = filter_receipts(Receipt.query, request.args)
         
         # Order by date desc
         query = query.order_by(Receipt.date.desc(), Receipt.number.desc())
@@ -102,7 +117,7 @@ def create_receipt():
 @receipt_bp.route('/receipts/<int:receipt_id>', methods=['GET'])
 def get_receipt(receipt_id):
     try:
-        receipt = Receipt.query.get_or_404(receipt_id)
+        receipt = Receipt.query.filter_by(id=receipt_id, deleted_at=None).first_or_404()
         return jsonify(receipt.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -110,8 +125,10 @@ def get_receipt(receipt_id):
 @receipt_bp.route('/receipts/<int:receipt_id>', methods=['PUT'])
 def update_receipt(receipt_id):
     try:
-        receipt = Receipt.query.get_or_404(receipt_id)
+        receipt = Receipt.query.filter_by(id=receipt_id, deleted_at=None).first_or_404()
         data = request.get_json()
+        if not request_user(data, 'updatedBy'):
+            return jsonify({'error': 'Missing required field: updatedBy'}), 400
         
         # Update fields
         if 'clientId' in data:
@@ -153,11 +170,13 @@ def update_receipt(receipt_id):
 @receipt_bp.route('/receipts/<int:receipt_id>/approve', methods=['POST'])
 def approve_receipt(receipt_id):
     try:
-        receipt = Receipt.query.get_or_404(receipt_id)
+        receipt = Receipt.query.filter_by(id=receipt_id, deleted_at=None).first_or_404()
         data = request.get_json()
+        if not request_user(data, 'approvedBy'):
+            return jsonify({'error': 'Missing required field: approvedBy'}), 400
         
         receipt.approved = True
-        receipt.approved_by = data.get('approvedBy')
+        receipt.approved_by = data.get('approvedBy') or g.audit_user
         receipt.approved_at = datetime.utcnow()
         
         # Update bank amount if provided
@@ -174,8 +193,15 @@ def approve_receipt(receipt_id):
 @receipt_bp.route('/receipts/<int:receipt_id>', methods=['DELETE'])
 def delete_receipt(receipt_id):
     try:
-        receipt = Receipt.query.get_or_404(receipt_id)
-        db.session.delete(receipt)
+        receipt = Receipt.query.filter_by(id=receipt_id, deleted_at=None).first_or_404()
+        data = request.get_json(silent=True) or {}
+        deleted_by = request_user(data, 'deletedBy')
+        if not deleted_by:
+            return jsonify({'error': 'Missing required field: deletedBy'}), 400
+        
+        # Soft delete keeps the row (and its number) for the audit trail
+        receipt.deleted_at = datetime.utcnow()
+        receipt.deleted_by = deleted_by
         db.session.commit()
         
         return jsonify({'message': 'Receipt deleted successfully'})
@@ -184,13 +210,14 @@ def delete_receipt(receipt_id):
         return jsonify({'error': str(e)}), 500
 
 @receipt_bp.route('/receipts/stats', methods=['GET'])
+@single_flight
 def get_receipt_stats():
     try:
         branch = request.args.get('branch')
         created_by = request.args.get('created_by')
         
         # Build base query
-        query = Receipt.query
+        query = Receipt.query.filter(Receipt.deleted_at.is_(None))
         if branch and branch != 'الكل':
             query = query.filter(Receipt.branch == branch)
         if created_by:
@@ -214,14 +241,14 @@ def get_receipt_stats():
             Receipt.branch,
             db.func.sum(Receipt.bank_amount).label('total'),
             db.func.count(Receipt.id).label('count')
-        ).group_by(Receipt.branch).all()
+        ).filter(Receipt.deleted_at.is_(None)).group_by(Receipt.branch).all()
         
         # Method stats
         method_stats = db.session.query(
             Receipt.method,
             db.func.sum(Receipt.bank_amount).label('total'),
             db.func.count(Receipt.id).label('count')
-        ).group_by(Receipt.method).all()
+        ).filter(Receipt.deleted_at.is_(None)).group_by(Receipt.method).all()
         
         return jsonify({
             'totalReceipts': total_receipts,
@@ -0,0 +1,154 @@
+from flask import Blueprint, request, jsonify
+from src.models.receipt import db, Receipt, SystemLists
+from src.models.reconciliation import BankStatement, StatementLine, ReconciliationMatch
+from src.services.reconciliation import import_statement, match_statement, approve_matches, reject_line_matches, StatementError
+from src.services.jobs import job_runner
+import json
+
+reconciliation_bp = Blueprint('reconciliation', __name__)
+
+@reconciliation_bp.route('/reconciliation/statements', methods=['POST'])
+def upload_statement():
+    try:
+        # Either a multipart upload (file field) or JSON with the CSV text
+        if request.files.get('file'):
+            upload = request.files['file']
+            data = request.form
+            text = upload.read().decode('utf-8-sig')
+            filename = upload.filename
+        else:
+            data = request.get_json()
+            text = data.get('csv')
+            filename = data.get('filename')
+        
+        bank = data.get('bank')
+        if not bank:
+            return jsonify({'error': 'Missing required field: bank'}), 400
+        if not text:
+            return jsonify({'error': 'Missing statement file'}), 400
+        
+        banks = SystemLists.query.filter_by(list_type='banks').first()
+        if banks and bank not in json.loads(banks.items):
+            return jsonify({'error': f'Unknown bank: {bank}'}), 400
+        
+        statement, duplicates = import_statement(bank, text, filename, data.get('importedBy'))
+        
+        result = statement.to_dict()
+        result['duplicatesSkipped'] = duplicates
+        return jsonify(result), 201
+    except StatementError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@reconciliation_bp.route('/reconciliation/statements', methods=['GET'])
+def get_statements():
+    try:
+        statements = BankStatement.query.order_by(BankStatement.id.desc()).all()
+        
+        # Line counts per status for every statement in one query
+        counts = {}
+        for statement_id, status, count in db.session.query(
+            StatementLine.statement_id, StatementLine.status, db.func.count(StatementLine.id)
+        ).group_by(StatementLine.statement_id, StatementLine.status):
+            counts.setdefault(statement_id, {})[status] = count
+        
+        result = []
+        for statement in statements:
+            item = statement.to_dict()
+            item['statusCounts'] = counts.get(statement.id, {})
+            result.append(item)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reconciliation_bp.route('/reconciliation/statements/<int:statement_id>/lines', methods=['GET'])
+def get_statement_lines(statement_id):
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 100, type=int)
+        status = request.args.get('status')
+        
+        query = StatementLine.query.filter_by(statement_id=statement_id)
+        if status:
+            query = query.filter(StatementLine.status == status)
+        lines = query.order_by(StatementLine.date, StatementLine.id).paginate(page=page, per_page=per_page, error_out=False)
+        
+        # Attach matches with the receipt numbers for this page only
+        line_ids = [line.id for line in lines.items]
+        matches = {}
+        for match, number, client_name in db.session.query(ReconciliationMatch, Receipt.number, Receipt.client_name) \
+                .join(Receipt, Receipt.id == ReconciliationMatch.receipt_id) \
+                .filter(ReconciliationMatch.line_id.in_(line_ids)):
+            item = match.to_dict()
+            item['receiptNumber'] = number
+            item['clientName'] = client_name
+            matches.setdefault(match.line_id, []).append(item)
+        
+        items = []
+        for line in lines.items:
+            item = line.to_dict()
+            item['matches'] = matches.get(line.id, [])
+            items.append(item)
+        
+        return jsonify({
+            'lines': items,
+            'total': lines.total,
+            'pages': lines.pages,
+            'current_page': lines.page,
+            'per_page': lines.per_page
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@reconciliation_bp.route('/reconciliation/statements/<int:statement_id>/match', methods=['POST'])
+def run_match(statement_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        window_days = int(data.get('windowDays', 3))
+        
+        # Large statements can run as a background job
+        if data.get('async'):
+            job = job_runner.submit('reconcile_statement', {'statementId': statement_id, 'windowDays': window_days},
+                                    data.get('createdBy'))
+            return jsonify(job.to_dict()), 202
+        
+        return jsonify(match_statement(statement_id, window_days))
+    except StatementError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@reconciliation_bp.route('/reconciliation/approve', methods=['POST'])
+def approve_reconciliation():
+    try:
+        data = request.get_json()
+        approved_by = data.get('approvedBy')
+        if not approved_by:
+            return jsonify({'error': 'Missing required field: approvedBy'}), 400
+        if data.get('statementId') is None and data.get('matchIds') is None:
+            return jsonify({'error': 'Provide statementId or matchIds'}), 400
+        
+        params = {'approvedBy': approved_by, 'statementId': data.get('statementId'), 'matchIds': data.get('matchIds')}
+        if data.get('async'):
+            job = job_runner.submit('approve_reconciliation', params, approved_by)
+            return jsonify(job.to_dict()), 202
+        
+        return jsonify(approve_matches(approved_by, data.get('statementId'), data.get('matchIds')))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@reconciliation_bp.route('/reconciliation/lines/<int:line_id>/reject', methods=['POST'])
+def reject_line(line_id):
+    try:
+        StatementLine.query.get_or_404(line_id)
+        rejected = reject_line_matches(line_id)
+        
+        return jsonify({'message': 'Matches rejected', 'rejected': rejected})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from src.services.analytics import collections_report, GROUP_COLUMNS, PERIODS, COMPARE_SHIFT
+from src.services.ratelimit import single_flight
+
+reports_bp = Blueprint('reports', __name__)
+
+FILTER_ARGS = ['branch', 'method', 'bank', 'reason', 'date_from', 'date_to', 'created_by']
+
+@reports_bp.route('/reports/collections', methods=['GET'])
+@single_flight
+def get_collections_report():
+    try:
+        group_by = request.args.get('group_by', 'branch')
+        period = request.args.get('period', 'month')
+        compare = request.args.get('compare', 'previous')
+        
+        if group_by not in GROUP_COLUMNS:
+            return jsonify({'error': f'Invalid group_by: {group_by}'}), 400
+        if period not in PERIODS:
+            return jsonify({'error': f'Invalid period: {period}'}), 400
+        if compare not in COMPARE_SHIFT and compare != 'none':
+            return jsonify({'error': f'Invalid compare: {compare}'}), 400
+        
+        filters = {name: request.args.get(name) for name in FILTER_ARGS}
+        
+        return jsonify(collections_report(group_by, period, compare, filters))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,236 @@
+from flask import Blueprint, request, jsonify
+from src.models.receipt import db, Receipt, Client
+from src.models.sync import ChangeLog, TRACKED_ENTITIES, latest_version
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import json
+
+sync_bp = Blueprint('sync', __name__)
+
+MODELS = {entity: (model, key_attr) for model, (entity, key_attr) in TRACKED_ENTITIES.items()}
+
+# Set only on the server (approval, bank reconciliation); dropped from pushed receipts
+SERVER_FIELDS = {'approved', 'approvedBy', 'approvedAt', 'bankAmount'}
+
+@sync_bp.route('/sync/changes', methods=['GET'])
+def get_changes():
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 500, type=int), 5000)
+        origin = request.args.get('origin')
+        entity = request.args.get('entity')
+
+        # A database restore reissues versions; cursors from before it must start over
+        restored_at = db.session.query(db.func.max(ChangeLog.version)).filter(
+            ChangeLog.entity == 'server', ChangeLog.operation == 'restore').scalar()
+        if since and restored_at and since < restored_at:
+            return jsonify({'changes': [], 'version': 0, 'hasMore': True, 'reset': True})
+
+        query = ChangeLog.query.filter(ChangeLog.version > since)
+        if entity:
+            query = query.filter(ChangeLog.entity == entity)
+        window = query.order_by(ChangeLog.version).limit(limit + 1).all()
+
+        has_more = len(window) > limit
+        window = window[:limit]
+        version = window[-1].version if window else since
+
+        # Keep only the newest change per row; older ones in the same window are superseded
+        latest = {}
+        for change in window:
+            if change.entity not in MODELS:
+                continue
+            latest.pop((change.entity, change.entity_key), None)
+            latest[(change.entity, change.entity_key)] = change
+
+        # Rows changed again after this window are sent (or skipped) with that later change
+        if has_more:
+            for superseded in _changed_after(list(latest), version):
+                del latest[superseded]
+
+        # Only after compaction are the caller's own changes dropped, so an older change
+        # from another node never overwrites the caller's newer write. They still advance the version.
+        changes = [change for change in latest.values() if not (origin and change.origin == origin)]
+
+        return jsonify({
+            'changes': [change.to_dict() for change in changes],
+            'version': version,
+            'hasMore': has_more
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sync_bp.route('/sync/push', methods=['POST'])
+def push_changes():
+    try:
+        data = request.get_json()
+        origin = data.get('origin')
+        if not origin:
+            return jsonify({'error': 'Missing required field: origin'}), 400
+
+        applied = 0
+        conflicts = []
+        db.session.info['sync_origin'] = origin
+        try:
+            for change in data.get('changes', []):
+                try:
+                    if change.get('entity') not in MODELS or change.get('op') not in ('insert', 'update', 'delete'):
+                        raise ValueError('Unknown entity or op')
+                    # One savepoint per change: a change the server cannot apply is undone
+                    # on its own and reported, so the branch outbox can move past it
+                    with db.session.begin_nested():
+                        conflict = _apply_change(change, origin)
+                        # Flush per change so the next lookup sees it and the log keeps push order
+                        db.session.flush()
+                except (ValueError, TypeError, KeyError, IntegrityError) as e:
+                    conflict = _invalid(change, str(e))
+                if conflict:
+                    conflicts.append(conflict)
+                else:
+                    applied += 1
+            db.session.commit()
+        finally:
+            db.session.info.pop('sync_origin', None)
+
+        return jsonify({
+            'applied': applied,
+            'conflicts': conflicts,
+            'version': latest_version()
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def _changed_after(keys, version):
+    by_entity = {}
+    for entity, key in keys:
+        by_entity.setdefault(entity, []).append(key)
+
+    changed = set()
+    for entity, entity_keys in by_entity.items():
+        for start in range(0, len(entity_keys), 500):
+            rows = db.session.query(ChangeLog.entity_key).filter(
+                ChangeLog.entity == entity,
+                ChangeLog.entity_key.in_(entity_keys[start:start + 500]),
+                ChangeLog.version > version
+            ).distinct()
+            changed.update((entity, key) for (key,) in rows)
+    return changed
+
+def _apply_change(change, origin):
+    """Apply one pushed change, or return a conflict describing why it was rejected.
+
+    Conflict rules:
+    - Approved receipts are final on the server; branches cannot update or delete them.
+    - If another node changed the row after the branch's baseVersion, an update wins
+      only when its updatedAt is newer than the server copy; a delete is rejected.
+    - Inserting a key that already exists from another node is a duplicate.
+    - Updating a row the server no longer has (or has soft-deleted) is rejected.
+    - Approval and bank amount are the server's: SERVER_FIELDS in a pushed receipt are ignored.
+    """
+    entity, key, op = change['entity'], str(change['key']), change['op']
+    payload = change.get('data') or {}
+    if entity == 'receipt':
+        payload = {field: value for field, value in payload.items() if field not in SERVER_FIELDS}
+
+    obj, last = _find(entity, key)
+    changed_elsewhere = last is not None and last.version > change.get('baseVersion', 0) and last.origin != origin
+
+    def conflict(reason):
+        return {
+            'entity': entity,
+            'key': key,
+            'op': op,
+            'reason': reason,
+            'server': obj.to_dict() if obj is not None else None,
+            'version': last.version if last else 0
+        }
+
+    if obj is None:
+        if op == 'update':
+            return conflict('deleted')
+        if op == 'delete':
+            return None
+        obj = Receipt.from_dict(payload) if entity == 'receipt' else Client(client_id=key)
+        if entity == 'client':
+            _update_client(obj, payload)
+        db.session.add(obj)
+        return None
+
+    if entity == 'receipt' and obj.deleted_at is not None:
+        # Deleted receipts keep their number, so it cannot be inserted again either
+        return None if op == 'delete' else conflict('deleted')
+    if entity == 'receipt' and obj.approved:
+        return conflict('approved')
+    if op == 'insert' and changed_elsewhere:
+        return conflict('duplicate')
+    if changed_elsewhere:
+        if op == 'delete':
+            return conflict('stale')
+        incoming = payload.get('updatedAt')
+        if not incoming or not obj.updated_at or datetime.fromisoformat(incoming) <= obj.updated_at:
+            return conflict('stale')
+
+    if op == 'delete' and entity == 'receipt':
+        obj.deleted_at = datetime.utcnow()
+        obj.deleted_by = f'sync:{origin}'
+    elif op == 'delete':
+        db.session.delete(obj)
+    elif entity == 'receipt':
+        _update_receipt(obj, payload)
+    else:
+        _update_client(obj, payload)
+    return None
+
+def _find(entity, key):
+    """The server row for a change and its newest change_log entry."""
+    model, key_attr = MODELS[entity]
+    key_value = int(key) if entity == 'receipt' else key
+    obj = model.query.filter(getattr(model, key_attr) == key_value).first()
+    last = ChangeLog.query.filter_by(entity=entity, entity_key=key).order_by(ChangeLog.version.desc()).first()
+    return obj, last
+
+def _invalid(change, error):
+    """Conflict for a change the server cannot apply; the branch falls back to the server copy."""
+    entity, key = change.get('entity'), str(change.get('key'))
+    obj, last = None, None
+    if entity in MODELS:
+        try:
+            obj, last = _find(entity, key)
+        except ValueError:
+            pass
+    return {
+        'entity': entity,
+        'key': key,
+        'op': change.get('op'),
+        'reason': 'invalid',
+        'error': error,
+        'server': obj.to_dict() if obj is not None else None,
+        'version': last.version if last else 0
+    }
+
+def _update_receipt(receipt, data):
+    for field, attr in (('clientId', 'client_id'), ('clientName', 'client_name'), ('amount', 'amount'),
+                        ('tafqeet', 'tafqeet'), ('method', 'method'), ('bank', 'bank'),
+                        ('reason', 'reason'), ('branch', 'branch'), ('attachment', 'attachment')):
+        if field in data:
+            setattr(receipt, attr, data[field])
+    if 'invoices' in data:
+        receipt.invoices = json.dumps(data['invoices'])
+    if data.get('date'):
+        receipt.date = datetime.fromisoformat(data['date']).date()
+    receipt.updated_at = _edited_at(data)
+
+def _update_client(client, data):
+    for field, attr in (('name', 'name'), ('phone', 'phone'), ('email', 'email'),
+                        ('address', 'address'), ('branch', 'branch')):
+        if field in data:
+            setattr(client, attr, data[field])
+    client.updated_at = _edited_at(data)
+
+def _edited_at(data):
+    # Keep the branch's edit time so later pushes are compared against when the edit
+    # was made, not when it reached the server
+    if data.get('updatedAt'):
+        return datetime.fromisoformat(data['updatedAt'])
+    return datetime.utcnow()
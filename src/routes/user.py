@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User
 from datetime import datetime
 
@@ -17,6 +17,8 @@ def login():
         user = User.query.filter_by(username=username, active=True).first()
         
         if user and user.check_password(password):
+            # Signed session cookie: the server-side identity used for rate limits and the audit trail
+            session['username'] = user.username
             return jsonify({
                 'success': True,
                 'user': user.to_dict(),
@@ -30,6 +32,11 @@ def login():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@user_bp.route('/auth/logout', methods=['POST'])
+def logout():
+    session.pop('username', None)
+    return jsonify({'success': True})
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
     try:
@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.models.receipt import db, Receipt
+from src.models.sync import latest_version
+from src.routes.receipt import filter_receipts
+
+GROUP_COLUMNS = {
+    'branch': Receipt.branch,
+    'bank': Receipt.bank,
+    'method': Receipt.method,
+}
+
+# numpy datetime unit for each period
+PERIODS = {
+    'day': 'D',
+    'month': 'M',
+    'year': 'Y',
+}
+
+# How many periods back the comparison value comes from; daily year-over-year
+# compares calendar days instead (see _previous)
+COMPARE_SHIFT = {
+    'previous': {'day': 1, 'month': 1, 'year': 1},
+    'year': {'day': 365, 'month': 12, 'year': 1},
+}
+
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def collections_report(group_by='branch', period='month', compare='previous', filters=None):
+    """Collections per group and period, with deltas against an earlier period.
+
+    The receipts are pulled in one grouped query as columns and aggregated with
+    numpy. Results are cached per (filters, grouping, period, comparison); the
+    cache key also carries the change_log version, so any receipt write from
+    any worker invalidates it.
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v}
+    key = (group_by, period, compare, tuple(sorted(filters.items())), latest_version())
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = _compute(group_by, period, compare, filters)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def _previous(periods, period, compare):
+    """The period each of periods (a datetime64 array) is compared with."""
+    if period == 'day' and compare == 'year':
+        # Same calendar day a year earlier; 29 February compares with the 28th
+        months = periods.astype('datetime64[M]')
+        day = (periods - months.astype('datetime64[D]')).astype(int)
+        earlier = months - 12
+        length = ((earlier + 1).astype('datetime64[D]') - earlier.astype('datetime64[D]')).astype(int)
+        return earlier.astype('datetime64[D]') + np.minimum(day, length - 1)
+    return periods - COMPARE_SHIFT[compare][period]
+
+
+def _compute(group_by, period, compare, filters):
+    unit = PERIODS[period]
+    compared = compare != 'none'
+
+    # Widen the start so the first requested periods have something to compare with
+    date_from = filters.get('date_from')
+    query_filters = dict(filters)
+    if date_from:
+        requested = np.datetime64(date_from[:10], 'D').astype(f'datetime64[{unit}]')
+        earliest = _previous(np.array([requested]), period, compare)[0] if compared else requested
+        query_filters['date_from'] = str(earliest.astype('datetime64[D]'))
+
+    # SQLite reduces to one row per (day, group) while scanning the covering
+    # ix_receipts_report index; numpy does the period roll-up and comparisons
+    group_column = GROUP_COLUMNS[group_by]
+    day = db.type_coerce(Receipt.date, db.String)
+    rows = filter_receipts(db.session.query(Receipt), query_filters).with_entities(
+        day,
+        group_column,
+        db.func.total(Receipt.bank_amount),
+        db.func.count()
+    ).group_by(day, group_column).all()
+    if not rows:
+        return {'groupBy': group_by, 'period': period, 'compare': compare, 'periods': [], 'series': [], 'totals': None}
+
+    dates, labels, amounts, row_counts = zip(*rows)
+    periods = np.array(dates, dtype='datetime64[D]').astype(f'datetime64[{unit}]')
+    amounts = np.array(amounts, dtype=float)  # total() treats NULL bank amounts as 0, like the stats SUM()
+    row_counts = np.array(row_counts, dtype=np.int64)
+    names, group_index = np.unique(np.array(labels, dtype=object).astype(str), return_inverse=True)
+
+    first, last = periods.min(), periods.max()
+    if date_from:
+        first = min(first, earliest)
+    if filters.get('date_to'):
+        last = np.datetime64(filters['date_to'][:10], 'D').astype(f'datetime64[{unit}]')
+    span = int((last - first).astype(int)) + 1
+    period_index = (periods - first).astype(int)
+
+    # One bincount per measure fills the whole group x period matrix
+    flat = group_index * span + period_index
+    totals = np.bincount(flat, weights=amounts, minlength=len(names) * span).reshape(len(names), span)
+    counts = np.bincount(flat, weights=row_counts, minlength=len(names) * span).reshape(len(names), span).astype(np.int64)
+
+    # Only report periods inside the requested range; earlier ones only feed comparisons
+    start = 0
+    if date_from:
+        start = int((requested - first).astype(int))
+    reported = np.arange(first, last + 1)[start:]
+    labels_out = [str(p) for p in reported]
+
+    # Column of the compared period for each reported one; negative when it
+    # falls before the data, which then compares with zero
+    if compared:
+        previous_index = (_previous(reported, period, compare) - first).astype(int)
+        known = previous_index >= 0
+
+    def compare_block(matrix):
+        current = matrix[..., start:]
+        if not compared:
+            return current, None, None, None
+        previous = np.zeros_like(current)
+        previous[..., known] = matrix[..., previous_index[known]]
+        delta = current - previous
+        pct = np.full(current.shape, np.nan)
+        np.divide(delta * 100, previous, out=pct, where=previous != 0)
+        return current, previous, delta, pct
+
+    def as_list(values):
+        return None if values is None else [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+    current, previous, delta, pct = compare_block(totals)
+    series = []
+    for i, name in enumerate(names):
+        series.append({
+            'name': name,
+            'amounts': as_list(current[i]),
+            'counts': counts[i, start:].tolist(),
+            'previous': as_list(previous[i]) if compared else None,
+            'delta': as_list(delta[i]) if compared else None,
+            'deltaPct': as_list(pct[i]) if compared else None,
+            'total': round(float(current[i].sum()), 2)
+        })
+    series.sort(key=lambda s: s['total'], reverse=True)
+
+    all_current, all_previous, all_delta, all_pct = compare_block(totals.sum(axis=0))
+    return {
+        'groupBy': group_by,
+        'period': period,
+        'compare': compare,
+        'periods': labels_out,
+        'series': series,
+        'totals': {
+            'amounts': as_list(all_current),
+            'counts': counts.sum(axis=0)[start:].tolist(),
+            'previous': as_list(all_previous),
+            'delta': as_list(all_delta),
+            'deltaPct': as_list(all_pct)
+        }
+    }
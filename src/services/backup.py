@@ -0,0 +1,384 @@
+import os
+import gzip
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+
+import click
+
+SNAPSHOT_PREFIX = 'app-'
+SNAPSHOT_SUFFIX = '.db.gz'
+LOCK_NAME = '.backup.lock'
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupService:
+    """Online snapshots of the SQLite database.
+
+    Pages are copied in small steps through SQLite's backup API with a short
+    pause between steps, so writers keep working while a snapshot is taken.
+    Each snapshot is gzip-compressed next to a JSON manifest holding its
+    SHA-256 checksum and timing figures.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.db_path = None
+        self.backup_dir = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._state = {
+            'running': False,
+            'operation': None,
+            'pagesTotal': 0,
+            'pagesRemaining': 0,
+            'startedAt': None,
+            'lastBackup': None,
+            'lastError': None
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BACKUP_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'backups'))
+        app.config.setdefault('BACKUP_INTERVAL', int(os.environ.get('BACKUP_INTERVAL', 6 * 3600)))  # seconds, 0 disables
+        app.config.setdefault('BACKUP_RETENTION', int(os.environ.get('BACKUP_RETENTION', 14)))
+        app.config.setdefault('BACKUP_PAGES_PER_STEP', 256)
+        app.config.setdefault('BACKUP_STEP_SLEEP', 0.005)
+
+        self.app = app
+        self.backup_dir = app.config['BACKUP_DIR']
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        if not uri.startswith('sqlite:///'):
+            raise BackupError('Online backup requires a SQLite database')
+        self.db_path = uri[len('sqlite:///'):]
+
+        app.extensions['backup'] = self
+        app.cli.add_command(backup_cli)
+
+        if app.config['BACKUP_INTERVAL'] > 0:
+            self.start()
+
+    # Scheduler
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_scheduler, name='backup-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run_scheduler(self):
+        interval = self.app.config['BACKUP_INTERVAL']
+        while not self._stop.wait(60):
+            latest = self.list_snapshots()[:1]
+            if latest and time.time() - latest[0]['createdTs'] < interval:
+                continue
+            try:
+                self.create_snapshot()
+            except Exception:
+                # Recorded in status; the next tick tries again
+                pass
+
+    # Snapshots
+
+    def create_snapshot(self):
+        self._begin('backup')
+        return self._snapshot()
+
+    def start_snapshot(self):
+        """Take the backup lock now and copy in a background thread.
+
+        Raises BackupError straight away when a backup or restore in this or
+        another worker process holds the lock; later failures go to lastError.
+        """
+        self._begin('backup')
+        thread = threading.Thread(target=self._background_snapshot, name='backup-manual', daemon=True)
+        thread.start()
+
+    def _background_snapshot(self):
+        try:
+            self._snapshot()
+        except Exception:
+            # Surfaced through lastError in the status endpoint
+            pass
+
+    def _snapshot(self):
+        """Copy, compress and rotate; the caller holds the lock, which is released here."""
+        started = time.time()
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+        name = f'{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}'
+        raw_path = os.path.join(self.backup_dir, f'.{stamp}.tmp.db')
+        gz_path = os.path.join(self.backup_dir, name)
+        try:
+            self._copy_online(self.db_path, raw_path)
+            copied = time.time()
+            raw_size = os.path.getsize(raw_path)
+            checksum = self._compress(raw_path, gz_path)
+            finished = time.time()
+
+            manifest = {
+                'name': name,
+                'createdAt': datetime.utcfromtimestamp(started).isoformat(),
+                'createdTs': started,
+                'sha256': checksum,
+                'dbSize': raw_size,
+                'compressedSize': os.path.getsize(gz_path),
+                'copySeconds': round(copied - started, 3),
+                'totalSeconds': round(finished - started, 3),
+                'throughputMBps': round(raw_size / max(copied - started, 1e-6) / (1024 * 1024), 2)
+            }
+            with open(gz_path + '.json', 'w') as f:
+                json.dump(manifest, f)
+
+            self._rotate()
+            self._state['lastBackup'] = manifest
+            self._state['lastError'] = None
+            return manifest
+        except Exception as e:
+            self._state['lastError'] = str(e)
+            if os.path.exists(gz_path):
+                os.remove(gz_path)
+            raise
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+            self._release()
+
+    def restore_snapshot(self, name):
+        gz_path = self._snapshot_path(name)
+        manifest = self._read_manifest(gz_path)
+        self._begin('restore')
+
+        raw_path = os.path.join(self.backup_dir, '.restore.tmp.db')
+        try:
+            digest = hashlib.sha256()
+            with gzip.open(gz_path, 'rb') as src, open(raw_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    dst.write(chunk)
+            if digest.hexdigest() != manifest['sha256']:
+                raise BackupError(f'Checksum mismatch for {name}')
+
+            check = sqlite3.connect(raw_path)
+            try:
+                result = check.execute('PRAGMA integrity_check').fetchone()[0]
+            finally:
+                check.close()
+            if result != 'ok':
+                raise BackupError(f'Integrity check failed for {name}: {result}')
+
+            last_version = self._last_version()
+            # Copy back through the backup API so open connections see the restored pages
+            self._copy_online(raw_path, self.db_path)
+            self._mark_restore(name, last_version)
+            self._state['lastError'] = None
+            return manifest
+        except Exception as e:
+            self._state['lastError'] = str(e)
+            raise
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+            self._release()
+
+    def list_snapshots(self):
+        if not self.backup_dir or not os.path.isdir(self.backup_dir):
+            return []
+        snapshots = []
+        for filename in os.listdir(self.backup_dir):
+            if filename.startswith(SNAPSHOT_PREFIX) and filename.endswith(SNAPSHOT_SUFFIX):
+                try:
+                    snapshots.append(self._read_manifest(os.path.join(self.backup_dir, filename)))
+                except BackupError:
+                    continue
+        snapshots.sort(key=lambda s: s['name'], reverse=True)
+        return snapshots
+
+    def status(self):
+        state = dict(self._state)
+        state['dbPath'] = self.db_path
+        state['backupDir'] = self.backup_dir
+        state['interval'] = self.app.config['BACKUP_INTERVAL']
+        state['retention'] = self.app.config['BACKUP_RETENTION']
+        state['snapshots'] = self.list_snapshots()
+        return state
+
+    # Internals
+
+    def _copy_online(self, source_path, target_path):
+        pages_per_step = self.app.config['BACKUP_PAGES_PER_STEP']
+        pause = self.app.config['BACKUP_STEP_SLEEP']
+
+        def progress(status, remaining, total):
+            self._state['pagesRemaining'] = remaining
+            self._state['pagesTotal'] = total
+            if pause:
+                time.sleep(pause)
+
+        source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            # Pin one read snapshot for the whole copy. Without it every commit from
+            # another connection restarts the backup, which never finishes under load.
+            # In WAL mode the open read transaction does not block writers.
+            source.execute('BEGIN')
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=pages_per_step, progress=progress)
+            source.execute('COMMIT')
+        finally:
+            target.close()
+            source.close()
+
+    def _last_version(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            version = conn.execute('SELECT max(version) FROM change_log').fetchone()[0] or 0
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            return max(version, row[0] if row else 0)
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
+    def _mark_restore(self, name, last_version):
+        """Log the restore as a change_log version above everything issued before it.
+
+        The restored change_log is older than the live one, so its versions would be
+        handed out again. The marker moves the sequence past the pre-restore maximum,
+        tells branches to pull again from scratch and changes the version that
+        report caches are keyed on.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                restored = conn.execute('SELECT max(version) FROM change_log').fetchone()[0] or 0
+                conn.execute(
+                    "INSERT INTO change_log (version, entity, entity_key, operation, origin, created_at) "
+                    "VALUES (?, 'server', ?, 'restore', 'server', ?)",
+                    (max(last_version, restored) + 1, name, datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f'))
+                )
+        except sqlite3.OperationalError:
+            # Snapshot predates the change log; there is no version history to protect
+            pass
+        finally:
+            conn.close()
+
+    def _compress(self, raw_path, gz_path):
+        digest = hashlib.sha256()
+        with open(raw_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+        return digest.hexdigest()
+
+    def _rotate(self):
+        retention = self.app.config['BACKUP_RETENTION']
+        for snapshot in self.list_snapshots()[retention:]:
+            path = os.path.join(self.backup_dir, snapshot['name'])
+            for stale in (path, path + '.json'):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+    def _snapshot_path(self, name):
+        if os.path.basename(name) != name or not name.endswith(SNAPSHOT_SUFFIX):
+            raise BackupError(f'Invalid snapshot name: {name}')
+        path = os.path.join(self.backup_dir, name)
+        if not os.path.exists(path):
+            raise BackupError(f'Snapshot not found: {name}')
+        return path
+
+    def _read_manifest(self, gz_path):
+        try:
+            with open(gz_path + '.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise BackupError(f'Missing or unreadable manifest for {os.path.basename(gz_path)}')
+
+    def _begin(self, operation):
+        os.makedirs(self.backup_dir, exist_ok=True)
+        if not self._acquire(operation):
+            raise BackupError('A backup or restore is already running')
+
+    def _acquire(self, operation):
+        if not self._lock.acquire(blocking=False):
+            return False
+        # The lock file keeps separate worker processes from backing up at the same time
+        lock_path = os.path.join(self.backup_dir, LOCK_NAME)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lock_path) < 3600:
+                self._lock.release()
+                return False
+            os.remove(lock_path)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+
+        self._state.update({
+            'running': True,
+            'operation': operation,
+            'pagesTotal': 0,
+            'pagesRemaining': 0,
+            'startedAt': datetime.utcnow().isoformat()
+        })
+        return True
+
+    def _release(self):
+        self._state['running'] = False
+        self._state['operation'] = None
+        lock_path = os.path.join(self.backup_dir, LOCK_NAME)
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+        self._lock.release()
+
+
+backup_service = BackupService()
+
+
+@click.group('backup')
+def backup_cli():
+    """Create, list and restore database snapshots."""
+
+
+@backup_cli.command('create')
+def create_command():
+    try:
+        manifest = backup_service.create_snapshot()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{manifest['name']}  {manifest['dbSize']} bytes  {manifest['throughputMBps']} MB/s")
+
+
+@backup_cli.command('list')
+def list_command():
+    for snapshot in backup_service.list_snapshots():
+        click.echo(f"{snapshot['name']}  {snapshot['createdAt']}  {snapshot['compressedSize']} bytes  {snapshot['sha256'][:12]}")
+
+
+@backup_cli.command('restore')
+@click.argument('name')
+def restore_command(name):
+    try:
+        backup_service.restore_snapshot(name)
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Restored {name}')
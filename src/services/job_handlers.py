@@ -0,0 +1,137 @@
+import csv
+from datetime import datetime
+
+from src.models.receipt import db, Receipt
+from src.models.user import User
+from src.routes.receipt import filter_receipts
+from src.services.jobs import job_runner
+from src.services.backup import backup_service
+from src.services.reconciliation import match_statement, approve_matches
+
+BATCH_SIZE = 500
+
+EXPORT_COLUMNS = [
+    ('number', 'رقم السند'),
+    ('date', 'التاريخ'),
+    ('clientId', 'رقم العميل'),
+    ('clientName', 'اسم العميل'),
+    ('amount', 'المبلغ'),
+    ('bankAmount', 'المبلغ في البنك'),
+    ('method', 'طريقة الدفع'),
+    ('bank', 'البنك'),
+    ('reason', 'السبب'),
+    ('branch', 'الفرع'),
+    ('createdBy', 'المستخدم'),
+    ('approved', 'معتمد'),
+    ('approvedBy', 'اعتمد بواسطة'),
+]
+
+
+@job_runner.handler('export_receipts', concurrency=2)
+def export_receipts(ctx):
+    """Write the filtered receipt list to CSV. Params are the GET /receipts filters."""
+    query = filter_receipts(Receipt.query, ctx.params).order_by(Receipt.date.desc(), Receipt.number.desc())
+    total = query.count()
+
+    written = 0
+    # utf-8-sig so Excel opens the Arabic text correctly
+    with open(ctx.file_path('csv'), 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([title for _, title in EXPORT_COLUMNS])
+        for receipt in query.yield_per(BATCH_SIZE):
+            data = receipt.to_dict()
+            writer.writerow([data[field] for field, _ in EXPORT_COLUMNS])
+            written += 1
+            if written % BATCH_SIZE == 0:
+                ctx.progress(written, total, f'{written}/{total}')
+
+    return {'rows': written}
+
+
+@job_runner.handler('bulk_approve', concurrency=1)
+def bulk_approve(ctx):
+    """Approve receipts by id list or by filters.
+
+    Params: approvedBy, and either ids or filters. bankAmounts may map a
+    receipt id to the amount confirmed in the bank.
+    """
+    approved_by = ctx.params.get('approvedBy')
+    if not approved_by:
+        raise ValueError('Missing required param: approvedBy')
+    bank_amounts = {int(k): v for k, v in (ctx.params.get('bankAmounts') or {}).items()}
+
+    query = Receipt.query.filter(Receipt.approved == False)
+    if ctx.params.get('ids') is not None:
+        query = query.filter(Receipt.id.in_(ctx.params['ids']), Receipt.deleted_at.is_(None))
+    else:
+        query = filter_receipts(query, ctx.params.get('filters') or {})
+    ids = [receipt_id for (receipt_id,) in query.with_entities(Receipt.id).order_by(Receipt.id)]
+
+    approved = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        now = datetime.utcnow()
+        # One transaction per batch keeps the writer lock short for other requests.
+        # Receipts approved or deleted since the ids were collected keep their approval.
+        batch = Receipt.query.filter(
+            Receipt.id.in_(ids[start:start + BATCH_SIZE]),
+            Receipt.approved == False,
+            Receipt.deleted_at.is_(None)
+        )
+        for receipt in batch:
+            receipt.approved = True
+            receipt.approved_by = approved_by
+            receipt.approved_at = now
+            if receipt.id in bank_amounts:
+                receipt.bank_amount = bank_amounts[receipt.id]
+            approved += 1
+        db.session.commit()
+        ctx.progress(start + BATCH_SIZE, len(ids), f'{approved}/{len(ids)}')
+
+    return {'approved': approved, 'skipped': len(ids) - approved}
+
+
+@job_runner.handler('import_receipts', concurrency=1)
+def import_receipts(ctx):
+    """Create receipts from a list of receipt dicts (same shape as POST /receipts)."""
+    rows = ctx.params.get('receipts') or []
+    required_fields = ['number', 'clientName', 'amount', 'method', 'bank', 'reason', 'branch', 'createdBy']
+
+    existing = {number for (number,) in db.session.query(Receipt.number)}
+    created, skipped = 0, []
+    last_serials = {}
+    for index, data in enumerate(rows, 1):
+        missing = [field for field in required_fields if not data.get(field)]
+        if missing:
+            skipped.append({'row': index, 'error': f'Missing required field: {missing[0]}'})
+        elif data['number'] in existing:
+            skipped.append({'row': index, 'error': 'Receipt number already exists'})
+        else:
+            db.session.add(Receipt.from_dict(data))
+            existing.add(data['number'])
+            last_serials[data['createdBy']] = max(last_serials.get(data['createdBy'], 0), data['number'])
+            created += 1
+
+        if index % BATCH_SIZE == 0:
+            db.session.commit()
+            ctx.progress(index, len(rows), f'{index}/{len(rows)}')
+
+    for user in User.query.filter(User.username.in_(list(last_serials))):
+        user.last_serial = max(user.last_serial or 0, last_serials[user.username])
+    db.session.commit()
+
+    return {'created': created, 'skipped': skipped}
+
+
+@job_runner.handler('backup', concurrency=1)
+def backup(ctx):
+    return backup_service.create_snapshot()
+
+
+@job_runner.handler('reconcile_statement', concurrency=1)
+def reconcile_statement(ctx):
+    return match_statement(ctx.params['statementId'], ctx.params.get('windowDays', 3), ctx.progress)
+
+
+@job_runner.handler('approve_reconciliation', concurrency=1)
+def approve_reconciliation(ctx):
+    return approve_matches(ctx.params['approvedBy'], ctx.params.get('statementId'), ctx.params.get('matchIds'), ctx.progress)
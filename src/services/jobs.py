@@ -0,0 +1,249 @@
+import os
+import json
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from src.models.user import db
+from src.models.job import Job
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobContext:
+    """Handed to job handlers for progress reporting, cancellation and result files."""
+
+    def __init__(self, runner, job_id, params):
+        self.runner = runner
+        self.job_id = job_id
+        self.params = params
+        self.result_file = None
+
+    def progress(self, done, total=None, message=None):
+        """Record progress and raise JobCancelled if a cancel was requested."""
+        fraction = done / total if total else done
+        updated = Job.query.filter_by(id=self.job_id).update({
+            'progress': min(max(fraction, 0), 1),
+            'message': message,
+            'heartbeat_at': datetime.utcnow()
+        })
+        db.session.commit()
+        if updated:
+            self.check_cancelled()
+
+    def check_cancelled(self):
+        cancel_requested = db.session.query(Job.cancel_requested).filter_by(id=self.job_id).scalar()
+        if cancel_requested:
+            raise JobCancelled()
+
+    def file_path(self, extension):
+        os.makedirs(self.runner.result_dir, exist_ok=True)
+        self.result_file = os.path.join(self.runner.result_dir, f'job-{self.job_id}.{extension}')
+        return self.result_file
+
+
+class JobRunner:
+    """In-process job queue backed by the jobs table.
+
+    A dispatcher thread claims queued jobs with a conditional UPDATE, so several
+    worker processes can share one database without running a job twice, and
+    hands them to a thread pool. Each job type has its own concurrency limit,
+    counted across all processes: the claim itself only succeeds while fewer
+    jobs of that type are running. Jobs whose heartbeat goes stale (the process
+    died or was restarted) are put back in the queue.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.handlers = {}
+        self.result_dir = None
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._executor = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOBS_ENABLED', os.environ.get('JOBS_ENABLED', '1') != '0')
+        app.config.setdefault('JOBS_MAX_WORKERS', int(os.environ.get('JOBS_MAX_WORKERS', 4)))
+        app.config.setdefault('JOBS_POLL_INTERVAL', 2)  # seconds
+        app.config.setdefault('JOBS_STALE_AFTER', 120)  # seconds without a heartbeat
+        app.config.setdefault('JOBS_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOBS_RESULT_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'jobs'))
+
+        self.app = app
+        self.result_dir = app.config['JOBS_RESULT_DIR']
+        app.extensions['jobs'] = self
+
+    def handler(self, job_type, concurrency=1):
+        """Register a function as the handler for job_type.
+
+        The handler receives a JobContext and returns a JSON-serialisable summary.
+        """
+        def decorator(func):
+            self.handlers[job_type] = {'func': func, 'concurrency': concurrency}
+            return func
+        return decorator
+
+    def start(self):
+        if not self.app.config['JOBS_ENABLED']:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.app.config['JOBS_MAX_WORKERS'], thread_name_prefix='job')
+        self._thread = threading.Thread(target=self._run_dispatcher, name='job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    # Queue operations, called from request handlers
+
+    def submit(self, job_type, params=None, created_by=None):
+        if job_type not in self.handlers:
+            raise ValueError(f'Unknown job type: {job_type}')
+        job = Job(job_type=job_type, params=json.dumps(params or {}, ensure_ascii=False), created_by=created_by)
+        db.session.add(job)
+        db.session.commit()
+        self._wake.set()
+        return job
+
+    def cancel(self, job):
+        # Conditional updates, like _claim: the dispatcher may have claimed the job
+        # since it was loaded, and a running job must not be marked cancelled
+        cancelled = Job.query.filter_by(id=job.id, status='queued').update(
+            {'status': 'cancelled', 'finished_at': datetime.utcnow()}, synchronize_session=False)
+        if not cancelled:
+            # The handler stops at its next progress call
+            Job.query.filter_by(id=job.id, status='running').update(
+                {'cancel_requested': True}, synchronize_session=False)
+        db.session.commit()
+        db.session.refresh(job)
+        return job
+
+    # Dispatcher
+
+    def _run_dispatcher(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self._recover_stale()
+                    self._dispatch()
+            except Exception:
+                traceback.print_exc()
+            self._wake.wait(self.app.config['JOBS_POLL_INTERVAL'])
+            self._wake.clear()
+
+    def _recover_stale(self):
+        now = datetime.utcnow()
+        # Keep our own running jobs alive, then requeue ones nobody is beating for
+        with self._in_flight_lock:
+            own = list(self._in_flight)
+        if own:
+            Job.query.filter(Job.id.in_(own), Job.status == 'running').update(
+                {'heartbeat_at': now}, synchronize_session=False)
+
+        cutoff = now - timedelta(seconds=self.app.config['JOBS_STALE_AFTER'])
+        stale = Job.query.filter(Job.status == 'running', Job.heartbeat_at < cutoff).all()
+        for job in stale:
+            if job.cancel_requested:
+                job.status = 'cancelled'
+                job.finished_at = now
+            elif job.attempts >= self.app.config['JOBS_MAX_ATTEMPTS']:
+                job.status = 'failed'
+                job.error = 'Worker stopped responding'
+                job.finished_at = now
+            else:
+                job.status = 'queued'
+                job.worker = None
+        db.session.commit()
+
+    def _dispatch(self):
+        with self._in_flight_lock:
+            free = self.app.config['JOBS_MAX_WORKERS'] - len(self._in_flight)
+        if free <= 0:
+            return
+
+        running = dict(db.session.query(Job.job_type, db.func.count(Job.id))
+                       .filter(Job.status == 'running').group_by(Job.job_type).all())
+        for job_type, spec in self.handlers.items():
+            capacity = min(spec['concurrency'] - running.get(job_type, 0), free)
+            if capacity <= 0:
+                continue
+            candidates = [job_id for (job_id,) in db.session.query(Job.id)
+                          .filter(Job.status == 'queued', Job.job_type == job_type)
+                          .order_by(Job.id).limit(capacity)]
+            for job_id in candidates:
+                if self._claim(job_id, job_type, spec['concurrency']):
+                    with self._in_flight_lock:
+                        self._in_flight.add(job_id)
+                    self._executor.submit(self._execute, job_id)
+                    free -= 1
+            if free <= 0:
+                return
+
+    def _claim(self, job_id, job_type=None, limit=None):
+        """Mark a queued job as ours; False if it is gone or job_type is at its limit."""
+        now = datetime.utcnow()
+        query = Job.query.filter_by(id=job_id, status='queued')
+        if limit is not None:
+            # Counted inside the UPDATE, which SQLite runs under the write lock, so
+            # two processes cannot both see the last free slot
+            other = db.aliased(Job)
+            running = db.select(db.func.count()).select_from(other) \
+                .where(other.job_type == job_type, other.status == 'running').scalar_subquery()
+            query = query.filter(running < limit)
+        claimed = query.update({
+            'status': 'running',
+            'worker': self.worker_id,
+            'started_at': now,
+            'heartbeat_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _execute(self, job_id):
+        try:
+            with self.app.app_context():
+                job = db.session.get(Job, job_id)
+                spec = self.handlers[job.job_type]
+                context = JobContext(self, job_id, json.loads(job.params) if job.params else {})
+                # Changes made by the job are audited under whoever submitted it
+                db.session.info['audit_actor'] = job.created_by or f'job:{job.job_type}'
+                db.session.commit()
+
+                updates = {}
+                try:
+                    result = spec['func'](context)
+                    updates.update(status='succeeded', progress=1, result=json.dumps(result, ensure_ascii=False),
+                                   result_file=context.result_file)
+                except JobCancelled:
+                    db.session.rollback()
+                    updates.update(status='cancelled')
+                except Exception as e:
+                    db.session.rollback()
+                    updates.update(status='failed', error=str(e))
+
+                updates['finished_at'] = datetime.utcnow()
+                Job.query.filter_by(id=job_id).update(updates)
+                db.session.commit()
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.discard(job_id)
+            self._wake.set()
+
+
+job_runner = JobRunner()
@@ -0,0 +1,251 @@
+import os
+import math
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+import threading
+from functools import wraps
+
+from flask import request, jsonify, make_response, session
+
+from src.models.user import db, User
+
+# (tokens per second, bucket size) for each request class
+DEFAULT_LIMITS = {
+    'read': (10.0, 40),
+    'heavy': (2.0, 10),
+    'write': (5.0, 20),
+}
+
+# Endpoints that scan the receipts table
+HEAVY_ENDPOINTS = {'receipt.get_receipts', 'receipt.get_receipt_stats', 'reports.get_collections_report'}
+
+
+def _retry_after(levels, cost):
+    """Seconds until every (key, tokens, rate) bucket holds cost tokens again."""
+    return max([(cost - tokens) / rate for _, tokens, rate in levels if tokens < cost], default=0)
+
+
+class MemoryBackend:
+    """Token buckets in a dict; enough for a single worker process."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, cost=1):
+        """Take cost tokens from every (key, rate, burst) bucket, or from none of them.
+
+        Returns (allowed, retry_after_seconds).
+        """
+        with self._lock:
+            # Read the clock under the lock so stored timestamps never go backwards
+            now = time.monotonic()
+            levels = []
+            for key, rate, burst in buckets:
+                tokens, stamp = self._buckets.get(key, (burst, now))
+                levels.append((key, min(burst, tokens + (now - stamp) * rate), rate))
+            allowed = all(tokens >= cost for _, tokens, _ in levels)
+            for key, tokens, _ in levels:
+                self._buckets[key] = (tokens - cost if allowed else tokens, now)
+            if len(self._buckets) > 10000:
+                # Drop callers idle for an hour; their buckets would be full anyway
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+        return allowed, _retry_after(levels, cost)
+
+
+class SharedMemoryBackend:
+    """Token buckets in a memory-mapped file shared by all worker processes.
+
+    The file holds a fixed open-addressing table of (key hash, tokens, timestamp)
+    slots guarded by an flock, so gunicorn workers on one host see the same
+    buckets. POSIX only; put the file on /dev/shm to keep it in memory.
+    """
+
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 16
+
+    def __init__(self, path, slots=4096):
+        import fcntl
+        self._fcntl = fcntl
+        self.slots = slots
+        size = self.SLOT.size * slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def take(self, buckets, cost=1):
+        with self._lock:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+            try:
+                # Read the clock under the lock: a stale, earlier timestamp written back
+                # would refill the bucket a second time for the same interval
+                now = time.time()
+                levels = []
+                slots = []
+                for key, rate, burst in buckets:
+                    digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+                    offset, tokens, stamp = self._find_slot(digest, burst, now)
+                    tokens = min(burst, tokens + max(now - stamp, 0) * rate)
+                    # Store the refilled level right away so the next key cannot take this slot
+                    self.SLOT.pack_into(self._map, offset, digest, tokens, now)
+                    levels.append((key, tokens, rate))
+                    slots.append((offset, digest, tokens))
+                allowed = all(tokens >= cost for _, tokens, _ in levels)
+                if allowed:
+                    for offset, digest, tokens in slots:
+                        self.SLOT.pack_into(self._map, offset, digest, tokens - cost, now)
+            finally:
+                self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        return allowed, _retry_after(levels, cost)
+
+    def _find_slot(self, digest, burst, now):
+        start = digest % self.slots
+        oldest = None
+        for i in range(self.PROBES):
+            offset = ((start + i) % self.slots) * self.SLOT.size
+            slot_digest, tokens, stamp = self.SLOT.unpack_from(self._map, offset)
+            if slot_digest == digest:
+                return offset, tokens, stamp
+            if slot_digest == 0:
+                return offset, burst, now
+            if oldest is None or stamp < oldest[1]:
+                oldest = (offset, stamp)
+        # Table neighbourhood is full: reuse the least recently touched slot
+        return oldest[0], burst, now
+
+
+class RateLimiter:
+    """Per-user and per-branch token buckets for the /api routes.
+
+    Callers are identified by the username in the signed session cookie set at
+    login, and their branch is the one in the users table; nothing the client
+    sends in headers can pick a bucket. Anonymous callers, and sessions whose
+    user no longer exists, fall back to a bucket per client address with no
+    branch bucket. A request must find tokens in both its user bucket and its
+    branch bucket, and takes from neither when one of them is empty, so one
+    noisy branch cannot use up the shared writer.
+    """
+
+    # How long a user's branch is remembered between lookups
+    BRANCH_TTL = 60
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.limits = dict(DEFAULT_LIMITS)
+        self._branches = {}
+        self._branches_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', os.environ.get('RATE_LIMIT_ENABLED', '1') != '0')
+        app.config.setdefault('RATE_LIMIT_BACKEND', os.environ.get('RATE_LIMIT_BACKEND', 'memory'))  # memory, shared
+        app.config.setdefault('RATE_LIMIT_SHM_PATH', os.path.join(
+            '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'asmidasanad-ratelimit'))
+        app.config.setdefault('RATE_LIMITS', {})
+
+        self.limits.update(app.config['RATE_LIMITS'])
+        if app.config['RATE_LIMIT_BACKEND'] == 'shared':
+            self.backend = SharedMemoryBackend(app.config['RATE_LIMIT_SHM_PATH'])
+        else:
+            self.backend = MemoryBackend()
+
+        app.extensions['ratelimit'] = self
+        if app.config['RATE_LIMIT_ENABLED']:
+            app.before_request(self._check)
+
+    def classify(self):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return 'write'
+        if request.endpoint in HEAVY_ENDPOINTS:
+            return 'heavy'
+        return 'read'
+
+    def _check(self):
+        if not request.path.startswith('/api/') or request.method == 'OPTIONS':
+            return None
+
+        kind = self.classify()
+        rate, burst = self.limits[kind]
+        username = session.get('username')
+        branch = self.user_branch(username) if username else None
+
+        if branch:
+            buckets = [(f'user:{username}:{kind}', rate, burst),
+                       # Branches share a larger bucket than a single user
+                       (f'branch:{branch}:{kind}', rate * 3, burst * 3)]
+        else:
+            buckets = [(f'addr:{request.remote_addr or "unknown"}:{kind}', rate, burst)]
+
+        allowed, retry_after = self.backend.take(buckets)
+        if not allowed:
+            response = make_response(jsonify({'error': 'Too many requests'}), 429)
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response
+        return None
+
+    def user_branch(self, username):
+        """Branch of a known, active user, or None. Cached for BRANCH_TTL seconds."""
+        now = time.monotonic()
+        with self._branches_lock:
+            cached = self._branches.get(username)
+        if cached and now - cached[1] < self.BRANCH_TTL:
+            return cached[0]
+
+        branch = db.session.query(User.branch).filter(User.username == username, User.active == True).scalar()
+        with self._branches_lock:
+            if len(self._branches) > 10000:
+                self._branches.clear()
+            self._branches[username] = (branch, now)
+        return branch
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def single_flight(view):
+    """Run concurrent identical GET requests for a view only once.
+
+    The first request computes the response; requests with the same endpoint
+    and query string that arrive while it runs wait and reuse its body.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.endpoint, tuple(sorted(request.args.items(multi=True))), tuple(sorted(kwargs.items())))
+        with _flights_lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.result is None:
+                return view(*args, **kwargs)
+            body, status, content_type = flight.result
+            return make_response(body, status, {'Content-Type': content_type})
+
+        try:
+            response = make_response(view(*args, **kwargs))
+            flight.result = (response.get_data(), response.status_code, response.content_type)
+            return response
+        finally:
+            with _flights_lock:
+                _flights.pop(key, None)
+            flight.done.set()
+    return wrapper
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,386 @@
+import csv
+import io
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from src.models.receipt import db, Receipt
+from src.models.reconciliation import BankStatement, StatementLine, ReconciliationMatch
+
+BATCH_SIZE = 500
+
+# Accepted CSV headers for each statement field
+HEADER_ALIASES = {
+    'date': {'date', 'value date', 'التاريخ', 'تاريخ العملية'},
+    'amount': {'amount', 'credit', 'المبلغ', 'دائن'},
+    'reference': {'reference', 'ref', 'المرجع', 'رقم المرجع'},
+    'description': {'description', 'details', 'البيان', 'الوصف'},
+}
+
+# Three-way splits only consider this many receipts nearest to the line date
+SPLIT_CANDIDATES = 30
+
+
+class StatementError(Exception):
+    pass
+
+
+def parse_statement_csv(text):
+    """Parse a bank statement CSV into line dicts. Debit (non-positive) lines are skipped."""
+    reader = csv.reader(io.StringIO(text.lstrip('\ufeff')))
+    header = next(reader, None)
+    if not header:
+        raise StatementError('Statement file is empty')
+
+    columns = {}
+    for index, name in enumerate(header):
+        name = name.strip().lower()
+        for field, aliases in HEADER_ALIASES.items():
+            if name in aliases:
+                columns[field] = index
+    for field in ('date', 'amount'):
+        if field not in columns:
+            raise StatementError(f'Missing column: {field}')
+
+    lines = []
+    for row_number, row in enumerate(reader, 2):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            amount = float(row[columns['amount']].replace(',', '').strip() or 0)
+            line_date = _parse_date(row[columns['date']].strip())
+        except (ValueError, IndexError):
+            raise StatementError(f'Invalid line {row_number}: {row}')
+        if amount <= 0:
+            continue
+        lines.append({
+            'date': line_date,
+            'amount': amount,
+            'reference': row[columns['reference']].strip() if 'reference' in columns else None,
+            'description': row[columns['description']].strip() if 'description' in columns else None
+        })
+    return lines
+
+
+def _parse_date(value):
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%Y/%m/%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def import_statement(bank, text, filename=None, imported_by=None):
+    """Store a statement and its lines. Returns (statement, number of lines already imported)."""
+    lines = parse_statement_csv(text)
+    if not lines:
+        raise StatementError('Statement has no credit lines')
+    lines, duplicates = _drop_imported(bank, lines)
+    if not lines:
+        raise StatementError('Statement was already imported')
+
+    statement = BankStatement(
+        bank=bank,
+        filename=filename,
+        date_from=min(line['date'] for line in lines),
+        date_to=max(line['date'] for line in lines),
+        line_count=len(lines),
+        total_amount=round(sum(line['amount'] for line in lines), 2),
+        imported_by=imported_by
+    )
+    db.session.add(statement)
+    db.session.flush()
+
+    db.session.bulk_insert_mappings(StatementLine, [
+        dict(line, statement_id=statement.id, bank=bank, status='unmatched') for line in lines
+    ])
+    db.session.commit()
+    return statement, duplicates
+
+
+def _drop_imported(bank, lines):
+    """Drop lines already imported for this bank, matched on (date, amount, reference).
+
+    Counted as a multiset, so genuinely repeated lines in one file are kept
+    while a re-imported or overlapping statement only adds its new lines.
+    """
+    existing = Counter(
+        (line_date, _cents(amount), reference or '')
+        for line_date, amount, reference in db.session.query(
+            StatementLine.date, StatementLine.amount, StatementLine.reference
+        ).filter(
+            StatementLine.bank == bank,
+            StatementLine.date >= min(line['date'] for line in lines),
+            StatementLine.date <= max(line['date'] for line in lines)
+        )
+    )
+    fresh = []
+    for line in lines:
+        key = (line['date'], _cents(line['amount']), line['reference'] or '')
+        if existing[key]:
+            existing[key] -= 1
+        else:
+            fresh.append(line)
+    return fresh, len(lines) - len(fresh)
+
+
+def match_statement(statement_id, window_days=3, progress=None):
+    """Propose receipts for the unmatched lines of a statement.
+
+    Receipts of the same bank are indexed once: a hash of amount (in halalas)
+    to date-sorted receipts for exact matches, then for splits, where one
+    deposit covers several receipts, a hash of per-(day, branch) totals and
+    date-sorted arrays searched for pairs and triples inside the date window.
+    Lookups are hash probes, bisects and sorted-array searches, so there is no
+    lines x receipts comparison.
+    """
+    statement = db.session.get(BankStatement, statement_id)
+    if statement is None:
+        raise StatementError(f'Statement not found: {statement_id}')
+
+    lines = db.session.query(StatementLine.id, StatementLine.date, StatementLine.amount) \
+        .filter_by(statement_id=statement_id, status='unmatched') \
+        .order_by(StatementLine.date, StatementLine.id).all()
+    if not lines:
+        return {'lines': 0, 'exact': 0, 'split': 0, 'unmatched': 0}
+
+    first = lines[0].date.toordinal() - window_days
+    last = lines[-1].date.toordinal() + window_days
+    taken = db.session.query(ReconciliationMatch.receipt_id).filter(ReconciliationMatch.status != 'rejected')
+    receipts = db.session.query(Receipt.id, Receipt.date, Receipt.amount, Receipt.branch).filter(
+        Receipt.bank == statement.bank,
+        Receipt.approved == False,
+        Receipt.deleted_at.is_(None),
+        Receipt.date >= datetime.fromordinal(first).date(),
+        Receipt.date <= datetime.fromordinal(last).date(),
+        ~Receipt.id.in_(taken)
+    ).order_by(Receipt.date, Receipt.id).all()
+
+    # Pairs a user rejected are never proposed again for the same line
+    rejected = defaultdict(set)
+    for line_id, receipt_id in db.session.query(ReconciliationMatch.line_id, ReconciliationMatch.receipt_id) \
+            .join(StatementLine, StatementLine.id == ReconciliationMatch.line_id) \
+            .filter(StatementLine.statement_id == statement_id, ReconciliationMatch.status == 'rejected'):
+        rejected[line_id].add(receipt_id)
+
+    # Exact pass: amount -> receipts sorted by date
+    by_cents = defaultdict(lambda: ([], []))
+    for receipt_id, receipt_date, amount, _ in receipts:
+        ordinals, ids = by_cents[_cents(amount)]
+        ordinals.append(receipt_date.toordinal())
+        ids.append(receipt_id)
+
+    # Line statuses are written together with the matches at the end, so a
+    # progress commit (or a cancelled job) never leaves half a result behind
+    matches = []
+    used = set()
+    proposed = []
+    remaining = []
+    for line in lines:
+        ordinals, ids = by_cents.get(_cents(line.amount), ([], []))
+        index = _nearest(ordinals, line.date.toordinal(), window_days, ids, rejected.get(line.id))
+        if index is None:
+            remaining.append(line)
+            continue
+        ordinals.pop(index)
+        receipt_id = ids.pop(index)
+        used.add(receipt_id)
+        matches.append({'line_id': line.id, 'receipt_id': receipt_id, 'amount': line.amount, 'kind': 'exact'})
+        proposed.append(line.id)
+    exact = len(matches)
+    if progress:
+        progress(exact, len(lines))
+
+    # Split pass over what is left, as date-sorted numpy columns with an
+    # availability mask. A branch usually deposits a whole day's receipts at
+    # once, so (day, branch) totals are hashed by amount first.
+    pool = [r for r in receipts if r[0] not in used]
+    pool_ordinals = np.array([r[1].toordinal() for r in pool], dtype=np.int64)
+    pool_cents = np.array([_cents(r[2]) for r in pool], dtype=np.int64)
+    pool_ids = np.array([r[0] for r in pool], dtype=np.int64)
+    available = np.ones(len(pool), dtype=bool)
+
+    day_groups = defaultdict(list)
+    for index, receipt in enumerate(pool):
+        day_groups[(receipt[1].toordinal(), receipt[3])].append(index)
+    groups_by_cents = defaultdict(list)
+    for key, members in day_groups.items():
+        if len(members) > 1:
+            groups_by_cents[int(pool_cents[members].sum())].append(key)
+
+    split = 0
+    for position, line in enumerate(remaining, 1):
+        if progress and position % BATCH_SIZE == 0:
+            progress(exact + position, len(lines))
+        target = _cents(line.amount)
+        day = line.date.toordinal()
+        excluded = rejected.get(line.id)
+
+        group = None
+        for key in sorted(groups_by_cents.get(target, []), key=lambda k: abs(k[0] - day)):
+            members = day_groups[key]
+            if abs(key[0] - day) <= window_days and available[members].all() \
+                    and not (excluded and excluded.intersection(pool_ids[members].tolist())):
+                group = members
+                break
+        if group is None:
+            lo, hi = np.searchsorted(pool_ordinals, [day - window_days, day + window_days + 1])
+            window = np.flatnonzero(available[lo:hi] & (pool_cents[lo:hi] < target) & (pool_cents[lo:hi] > 0)) + lo
+            if excluded:
+                window = window[~np.isin(pool_ids[window], list(excluded))]
+            group = _find_split(window, pool_ordinals, pool_cents, day, target)
+        if group is None:
+            continue
+
+        available[group] = False
+        for index in group:
+            receipt_id, _, amount, _ = pool[index]
+            matches.append({'line_id': line.id, 'receipt_id': receipt_id, 'amount': amount, 'kind': 'split'})
+        proposed.append(line.id)
+        split += 1
+
+    if matches:
+        db.session.bulk_insert_mappings(ReconciliationMatch, [dict(m, status='proposed') for m in matches])
+        db.session.bulk_update_mappings(StatementLine, [{'id': line_id, 'status': 'proposed'} for line_id in proposed])
+    db.session.commit()
+
+    return {'lines': len(lines), 'exact': exact, 'split': split, 'unmatched': len(lines) - exact - split}
+
+
+def _cents(amount):
+    return int(round((amount or 0) * 100))
+
+
+def _nearest(ordinals, day, window_days, ids=None, excluded=None):
+    """Index of the entry closest to day within the window, or None. Entries whose id is in excluded are skipped."""
+    index = bisect_left(ordinals, day)
+    left, right = index - 1, index
+    if excluded:
+        while left >= 0 and ids[left] in excluded:
+            left -= 1
+        while right < len(ordinals) and ids[right] in excluded:
+            right += 1
+    best = None
+    for candidate in (left, right):
+        if 0 <= candidate < len(ordinals) and abs(ordinals[candidate] - day) <= window_days:
+            if best is None or abs(ordinals[candidate] - day) < abs(ordinals[best] - day):
+                best = candidate
+    return best
+
+
+def _find_split(window, ordinals, cents, day, target):
+    """Pool indexes of a pair, else a triple, from window adding up to target.
+
+    Pairs are searched over the whole window at once: sort the amounts and
+    binary-search each complement. Triples only look at the receipts nearest
+    to the line date, to keep the search bounded.
+    """
+    if len(window) < 2:
+        return None
+    values = cents[window]
+    order = np.argsort(values, kind='stable')
+    ordered = values[order]
+    positions = np.arange(len(ordered))
+    partner = np.searchsorted(ordered, target - ordered)
+    # An amount that is exactly half the target must not pair with itself
+    partner = np.where(partner == positions, partner + 1, partner)
+    partner_clipped = np.minimum(partner, len(ordered) - 1)
+    hits = np.flatnonzero((partner < len(ordered)) & (ordered[partner_clipped] == target - ordered))
+    if len(hits):
+        first = window[order[hits]]
+        second = window[order[partner_clipped[hits]]]
+        distance = np.maximum(np.abs(ordinals[first] - day), np.abs(ordinals[second] - day))
+        best = int(np.argmin(distance))
+        return [int(first[best]), int(second[best])]
+
+    nearest = window[np.argsort(np.abs(ordinals[window] - day), kind='stable')[:SPLIT_CANDIDATES]].tolist()
+    amounts = [int(cents[i]) for i in nearest]
+    for i in range(len(nearest)):
+        rest = target - amounts[i]
+        seen = {}
+        for j in range(i + 1, len(nearest)):
+            if rest - amounts[j] in seen:
+                return [nearest[i], nearest[seen[rest - amounts[j]]], nearest[j]]
+            seen.setdefault(amounts[j], j)
+    return None
+
+
+def approve_matches(approved_by, statement_id=None, match_ids=None, progress=None):
+    """Confirm proposed matches and approve their receipts with the matched bank amount.
+
+    A line is only confirmed when all of its receipts are still open. If one was
+    approved or deleted after matching, the line's matches are rejected and the
+    line goes back to unmatched, so an existing approval is never overwritten.
+    """
+    query = ReconciliationMatch.query.filter(ReconciliationMatch.status == 'proposed')
+    if match_ids is not None:
+        query = query.filter(ReconciliationMatch.id.in_(match_ids))
+    if statement_id is not None:
+        query = query.join(StatementLine, StatementLine.id == ReconciliationMatch.line_id) \
+            .filter(StatementLine.statement_id == statement_id)
+    rows = query.with_entities(ReconciliationMatch.id, ReconciliationMatch.receipt_id,
+                               ReconciliationMatch.line_id, ReconciliationMatch.amount) \
+        .order_by(ReconciliationMatch.line_id, ReconciliationMatch.id).all()
+
+    # Batches hold whole lines, so a split match is never confirmed half way
+    by_line = defaultdict(list)
+    for match_id, receipt_id, line_id, amount in rows:
+        by_line[line_id].append((match_id, receipt_id, amount))
+    lines = list(by_line.items())
+
+    approved = 0
+    skipped = 0
+    for start in range(0, len(lines), BATCH_SIZE):
+        now = datetime.utcnow()
+        batch = lines[start:start + BATCH_SIZE]
+        receipt_ids = [receipt_id for _, matches in batch for _, receipt_id, _ in matches]
+        # Receipts go through the ORM so the change log sees the approvals;
+        # match and line bookkeeping is updated in bulk
+        receipts = {receipt.id: receipt for receipt in Receipt.query.filter(
+            Receipt.id.in_(receipt_ids), Receipt.approved == False, Receipt.deleted_at.is_(None))}
+
+        confirmed, rejected, matched_lines, reopened_lines = [], [], [], []
+        for line_id, matches in batch:
+            if not all(receipt_id in receipts for _, receipt_id, _ in matches):
+                rejected.extend(match_id for match_id, _, _ in matches)
+                reopened_lines.append(line_id)
+                continue
+            for match_id, receipt_id, amount in matches:
+                receipt = receipts[receipt_id]
+                receipt.approved = True
+                receipt.approved_by = approved_by
+                receipt.approved_at = now
+                receipt.bank_amount = amount
+                confirmed.append(match_id)
+                approved += 1
+            matched_lines.append(line_id)
+
+        ReconciliationMatch.query.filter(ReconciliationMatch.id.in_(confirmed)) \
+            .update({'status': 'confirmed', 'confirmed_by': approved_by}, synchronize_session=False)
+        ReconciliationMatch.query.filter(ReconciliationMatch.id.in_(rejected)) \
+            .update({'status': 'rejected'}, synchronize_session=False)
+        StatementLine.query.filter(StatementLine.id.in_(matched_lines)) \
+            .update({'status': 'matched'}, synchronize_session=False)
+        StatementLine.query.filter(StatementLine.id.in_(reopened_lines)) \
+            .update({'status': 'unmatched'}, synchronize_session=False)
+        db.session.commit()
+        skipped += len(reopened_lines)
+        if progress:
+            progress(start + len(batch), len(lines))
+
+    return {'approved': approved, 'skipped': skipped}
+
+
+def reject_line_matches(line_id):
+    """Reject the proposed matches of a statement line so it can be matched again.
+
+    The rejected rows are kept, so the next match run does not propose the same
+    receipts for this line.
+    """
+    rejected = ReconciliationMatch.query.filter_by(line_id=line_id, status='proposed').update({'status': 'rejected'})
+    StatementLine.query.filter_by(id=line_id, status='proposed').update({'status': 'unmatched'})
+    db.session.commit()
+    return rejected
@@ -0,0 +1,172 @@
+import json
+import sqlite3
+import urllib.parse
+import urllib.request
+
+PUSH_BATCH_SIZE = 200
+
+
+class HttpTransport:
+    """Talks to a running server over HTTP, e.g. HttpTransport('http://hq:5000/api')."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def get(self, path, params):
+        url = f'{self.base_url}{path}?{urllib.parse.urlencode(params)}'
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def post(self, path, payload):
+        body = json.dumps(payload).encode('utf-8')
+        req = urllib.request.Request(f'{self.base_url}{path}', data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+
+class FlaskTransport:
+    """Routes sync calls through a Flask test client instead of the network."""
+
+    def __init__(self, client, prefix='/api'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, path, params):
+        return self.client.get(self.prefix + path, query_string=params).get_json()
+
+    def post(self, path, payload):
+        return self.client.post(self.prefix + path, json=payload).get_json()
+
+
+class BranchNode:
+    """Stand-in for a remote branch replica.
+
+    Keeps receipts and clients in its own SQLite file, queues local edits in an
+    outbox and exchanges only deltas with the server through /sync/changes and
+    /sync/push. Useful for exercising the protocol without a real branch link.
+    """
+
+    def __init__(self, origin, transport, path=':memory:'):
+        self.origin = origin
+        self.transport = transport
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS rows (
+                entity TEXT NOT NULL,
+                key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                base_version INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (entity, key)
+            );
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                key TEXT NOT NULL,
+                op TEXT NOT NULL,
+                data TEXT,
+                base_version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        ''')
+
+    # Local edits
+
+    def save(self, entity, key, data):
+        key = str(key)
+        row = self.conn.execute('SELECT base_version FROM rows WHERE entity = ? AND key = ?', (entity, key)).fetchone()
+        op = 'update' if row else 'insert'
+        base_version = row[0] if row else 0
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO rows (entity, key, data, base_version) VALUES (?, ?, ?, ?)',
+                              (entity, key, json.dumps(data), base_version))
+            self.conn.execute('INSERT INTO outbox (entity, key, op, data, base_version) VALUES (?, ?, ?, ?, ?)',
+                              (entity, key, op, json.dumps(data), base_version))
+
+    def delete(self, entity, key):
+        key = str(key)
+        row = self.conn.execute('SELECT base_version FROM rows WHERE entity = ? AND key = ?', (entity, key)).fetchone()
+        with self.conn:
+            self.conn.execute('DELETE FROM rows WHERE entity = ? AND key = ?', (entity, key))
+            self.conn.execute('INSERT INTO outbox (entity, key, op, data, base_version) VALUES (?, ?, ?, NULL, ?)',
+                              (entity, key, 'delete', row[0] if row else 0))
+
+    def get(self, entity, key):
+        row = self.conn.execute('SELECT data FROM rows WHERE entity = ? AND key = ?', (entity, str(key))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def all(self, entity):
+        return [json.loads(data) for (data,) in self.conn.execute('SELECT data FROM rows WHERE entity = ? ORDER BY key', (entity,))]
+
+    def pending(self):
+        return self.conn.execute('SELECT count(*) FROM outbox').fetchone()[0]
+
+    @property
+    def version(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    # Protocol
+
+    def pull(self):
+        received = 0
+        while True:
+            result = self.transport.get('/sync/changes', {'since': self.version, 'origin': self.origin})
+            if result.get('reset'):
+                # The server was restored from a backup: drop everything but unpushed edits and start over
+                with self.conn:
+                    self.conn.execute('DELETE FROM rows WHERE NOT EXISTS '
+                                      '(SELECT 1 FROM outbox WHERE outbox.entity = rows.entity AND outbox.key = rows.key)')
+                    self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', '0')")
+                continue
+            with self.conn:
+                for change in result['changes']:
+                    key = str(change['key'])
+                    # Rows with unpushed local edits are left alone; the push settles them
+                    if self.conn.execute('SELECT 1 FROM outbox WHERE entity = ? AND key = ?', (change['entity'], key)).fetchone():
+                        continue
+                    if change['op'] == 'delete':
+                        self.conn.execute('DELETE FROM rows WHERE entity = ? AND key = ?', (change['entity'], key))
+                    else:
+                        self.conn.execute('INSERT OR REPLACE INTO rows (entity, key, data, base_version) VALUES (?, ?, ?, ?)',
+                                          (change['entity'], key, json.dumps(change['data']), change['version']))
+                    received += 1
+                self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('version', ?)", (str(result['version']),))
+            if not result['hasMore']:
+                return received
+
+    def push(self):
+        applied = 0
+        conflicts = []
+        while True:
+            batch = self.conn.execute('SELECT id, entity, key, op, data, base_version FROM outbox ORDER BY id LIMIT ?',
+                                      (PUSH_BATCH_SIZE,)).fetchall()
+            if not batch:
+                return {'applied': applied, 'conflicts': conflicts}
+
+            result = self.transport.post('/sync/push', {
+                'origin': self.origin,
+                'changes': [
+                    {'entity': entity, 'key': key, 'op': op, 'data': json.loads(data) if data else None, 'baseVersion': base_version}
+                    for _, entity, key, op, data, base_version in batch
+                ]
+            })
+            if 'error' in result:
+                raise RuntimeError(result['error'])
+
+            with self.conn:
+                # Rejected changes give way to the server copy
+                for conflict in result['conflicts']:
+                    if conflict['server'] is None:
+                        self.conn.execute('DELETE FROM rows WHERE entity = ? AND key = ?', (conflict['entity'], conflict['key']))
+                    else:
+                        self.conn.execute('INSERT OR REPLACE INTO rows (entity, key, data, base_version) VALUES (?, ?, ?, ?)',
+                                          (conflict['entity'], conflict['key'], json.dumps(conflict['server']), conflict['version']))
+                self.conn.execute('DELETE FROM outbox WHERE id <= ?', (batch[-1][0],))
+            applied += result['applied']
+            conflicts.extend(result['conflicts'])
+
+    def sync(self):
+        pushed = self.push()
+        pushed['received'] = self.pull()
+        return pushed
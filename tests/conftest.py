@@ -0,0 +1,74 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.user import db
+from src.models.receipt import SystemLists
+from src.routes.user import user_bp
+from src.routes.receipt import receipt_bp
+from src.routes.admin import admin_bp
+from src.routes.sync import sync_bp
+from src.routes.jobs import jobs_bp
+from src.routes.reports import reports_bp
+from src.routes.reconciliation import reconciliation_bp
+from src.routes.audit import audit_bp
+from src.services.backup import backup_service
+from src.services.jobs import job_runner
+import src.services.job_handlers  # registers the job types
+import json
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The API on a throwaway SQLite file, with background threads switched off."""
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}",
+        BACKUP_DIR=str(tmp_path / 'backups'),
+        BACKUP_INTERVAL=0,
+        JOBS_ENABLED=False,
+        JOBS_RESULT_DIR=str(tmp_path / 'jobs'),
+    )
+    for blueprint in (user_bp, receipt_bp, admin_bp, sync_bp, jobs_bp, reports_bp, reconciliation_bp, audit_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    db.init_app(app)
+    backup_service.init_app(app)
+    job_runner.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.text('PRAGMA journal_mode=WAL'))
+        db.session.add(SystemLists(list_type='banks', items=json.dumps(['الراجحي', 'الأهلي'])))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_receipt(client, number, **fields):
+    data = {
+        'number': number,
+        'clientName': 'عميل',
+        'amount': 100,
+        'method': 'تحويل بنكي',
+        'bank': 'الراجحي',
+        'reason': 'سداد فواتير',
+        'branch': 'الرياض',
+        'createdBy': 'admin',
+        'date': '2025-03-01',
+    }
+    data.update(fields)
+    response = client.post('/api/receipts', json=data)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
@@ -0,0 +1,153 @@
+from datetime import datetime
+
+import pytest
+
+from src.models.user import db, User
+from src.models import audit
+from src.models.audit import AuditLog
+from tests.conftest import make_receipt
+
+
+def history(client, entity, entity_id):
+    return client.get(f'/api/audit/{entity}/{entity_id}').get_json()
+
+
+def test_receipt_lifecycle_is_audited(client):
+    receipt = make_receipt(client, 1, attachment='data:image/png;base64,AAAA')
+    client.put(f"/api/receipts/{receipt['id']}", json={'amount': 150, 'clientName': 'عميل 2'}, headers={'X-User': 'admin'})
+    client.post(f"/api/receipts/{receipt['id']}/approve", json={'approvedBy': 'boss'})
+    client.delete(f"/api/receipts/{receipt['id']}", json={'deletedBy': 'admin'})
+
+    entries = history(client, 'receipt', receipt['id'])
+    assert [(e['action'], e['actor']) for e in entries] == [
+        ('create', 'admin'), ('update', 'admin'), ('update', 'boss'), ('delete', 'admin')]
+
+    created, updated, approved, deleted = (e['changes'] for e in entries)
+    assert created['number'] == 1 and created['attachment'] == '***'
+    assert updated == {'amount': [100.0, 150], 'client_name': ['عميل', 'عميل 2']}
+    assert approved['approved'] == [False, True] and approved['approved_by'] == [None, 'boss']
+    assert set(deleted) == {'deleted_at', 'deleted_by'}
+
+
+def test_receipt_writes_without_a_user_are_rejected(client):
+    receipt = make_receipt(client, 1)
+    # What the frontend sends: the inline bank-amount edit and a bodiless delete
+    assert client.put(f"/api/receipts/{receipt['id']}", json={'bankAmount': 90}).status_code == 400
+    assert client.delete(f"/api/receipts/{receipt['id']}").status_code == 400
+    assert client.post(f"/api/receipts/{receipt['id']}/approve", json={}).status_code == 400
+    assert [e['action'] for e in history(client, 'receipt', receipt['id'])] == ['create']
+
+
+def test_actor_comes_from_updated_by_or_the_login(client):
+    db.session.add(User(username='cashier', code='200', password='pw', role='فرعي', branch='جدة'))
+    db.session.commit()
+    receipt = make_receipt(client, 1)
+    client.put(f"/api/receipts/{receipt['id']}", json={'bankAmount': 90, 'updatedBy': 'auditor'})
+
+    assert client.post('/api/auth/login', json={'username': 'cashier', 'password': 'pw'}).status_code == 200
+    assert client.put(f"/api/receipts/{receipt['id']}", json={'bankAmount': 80}).status_code == 200
+    assert client.delete(f"/api/receipts/{receipt['id']}").status_code == 200
+
+    entries = history(client, 'receipt', receipt['id'])
+    assert [(e['action'], e['actor']) for e in entries] == [
+        ('create', 'admin'), ('update', 'auditor'), ('update', 'cashier'), ('delete', 'cashier')]
+    assert entries[-1]['changes']['deleted_by'] == [None, 'cashier']
+
+
+def test_soft_deleted_receipt_is_hidden_but_kept(client):
+    receipt = make_receipt(client, 1)
+    client.delete(f"/api/receipts/{receipt['id']}", headers={'X-User': 'admin'})
+
+    assert client.get('/api/receipts').get_json()['total'] == 0
+    assert client.get('/api/receipts/stats').get_json()['totalReceipts'] == 0
+    # The number stays taken
+    assert client.post('/api/receipts', json={
+        'number': 1, 'clientName': 'x', 'amount': 1, 'method': 'm', 'bank': 'b', 'reason': 'r',
+        'branch': 'br', 'createdBy': 'admin'}).status_code == 400
+
+
+def test_unchanged_values_and_passwords(client):
+    user = User(username='u1', code='101', password='secret', role='فرعي', branch='جدة')
+    db.session.add(user)
+    db.session.commit()
+
+    client.put(f'/api/users/{user.id}', json={'branch': 'جدة', 'password': 'changed'}, headers={'X-User': 'admin'})
+    entries = history(client, 'user', user.id)
+    assert entries[-1]['changes'] == {'password': ['***', '***']}
+
+
+def test_settings_changes_are_audited(client):
+    client.put('/api/company', json={'name': 'شركة'}, headers={'X-User': 'admin'})
+    client.put('/api/lists', json={'banks': ['الراجحي']}, headers={'X-User': 'admin'})
+
+    entities = {e['entity'] for e in client.get('/api/audit', query_string={'actor': 'admin'}).get_json()['entries']}
+    assert entities == {'company', 'system_lists'}
+
+
+def test_audit_rows_commit_and_roll_back_with_the_change(app):
+    before = AuditLog.query.filter_by(entity='user').count()
+    db.session.add(User(username='u2', code='102', password='x', role='فرعي', branch='جدة'))
+    db.session.flush()
+    assert AuditLog.query.filter_by(entity='user').count() == before + 1
+    db.session.rollback()
+    assert AuditLog.query.filter_by(entity='user').count() == before
+
+
+def test_audit_log_is_append_only(client):
+    make_receipt(client, 1)
+    for statement in ('UPDATE audit_log SET actor = NULL', 'DELETE FROM audit_log'):
+        with pytest.raises(Exception, match='append-only'):
+            db.session.execute(db.text(statement))
+        db.session.rollback()
+
+
+def test_query_filters_and_paging(client):
+    for number in range(1, 6):
+        make_receipt(client, number, createdBy='u1' if number % 2 else 'u2')
+
+    entries = client.get('/api/audit', query_string={'entity': 'receipt', 'actor': 'u1'}).get_json()['entries']
+    assert sorted(e['changes']['number'] for e in entries) == [1, 3, 5]
+
+    page = client.get('/api/audit', query_string={'entity': 'receipt', 'limit': 2}).get_json()
+    assert page['hasMore'] and len(page['entries']) == 2
+    rest = client.get('/api/audit', query_string={'entity': 'receipt', 'before': page['next']}).get_json()
+    assert len(rest['entries']) == 3 and not rest['hasMore']
+
+    assert client.get('/api/audit', query_string={'date_to': '2000-01-01'}).get_json()['entries'] == []
+    assert client.get('/api/audit', query_string={'entity': 'nope'}).status_code == 400
+
+
+def test_paging_follows_ids_when_timestamps_disagree(client):
+    # Rows whose created_at runs backwards against their ids (e.g. clock changes)
+    for hour in (12, 11, 10, 13, 9):
+        db.session.execute(db.text(
+            "INSERT INTO audit_log (entity, entity_id, action, changes, actor, created_at) "
+            "VALUES ('company', 1, 'update', '{}', 'clock', :at)"), {'at': f'2025-01-01 {hour:02d}:00:00.000000'})
+    db.session.commit()
+
+    seen, before = [], None
+    while True:
+        query = {'actor': 'clock', 'limit': 2}
+        if before:
+            query['before'] = before
+        page = client.get('/api/audit', query_string=query).get_json()
+        seen += [e['id'] for e in page['entries']]
+        if not page['hasMore']:
+            break
+        before = page['next']
+    assert seen == sorted(seen, reverse=True) and len(seen) == len(set(seen)) == 5
+
+
+def test_timestamps_are_stored_like_sqlalchemy_stores_them(client, monkeypatch):
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2025, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(audit, 'datetime', Clock)
+    client.put('/api/company', json={'name': 'شركة'}, headers={'X-User': 'admin'})
+
+    stored = db.session.execute(db.text("SELECT created_at FROM audit_log WHERE entity = 'company'")).scalar()
+    assert stored == '2025-01-01 12:00:00.000000'
+    entries = client.get('/api/audit', query_string={'entity': 'company', 'date_from': '2025-01-01T12:00:00'}).get_json()
+    assert len(entries['entries']) == 1
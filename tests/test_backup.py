@@ -0,0 +1,61 @@
+import os
+import time
+
+from src.models.receipt import Receipt
+from src.models.sync import latest_version
+from src.services.backup import backup_service, LOCK_NAME
+from src.services.sync_node import BranchNode, FlaskTransport
+from tests.conftest import make_receipt
+
+
+def test_snapshot_restores_data(client):
+    make_receipt(client, 8001)
+    manifest = backup_service.create_snapshot()
+    make_receipt(client, 8002)
+
+    backup_service.restore_snapshot(manifest['name'])
+
+    assert sorted(number for (number,) in Receipt.query.with_entities(Receipt.number)) == [8001]
+    assert [s['name'] for s in backup_service.list_snapshots()] == [manifest['name']]
+
+
+def test_restore_does_not_reuse_sync_versions(client):
+    branch = BranchNode('branch-a', FlaskTransport(client))
+    make_receipt(client, 8001)
+    manifest = backup_service.create_snapshot()
+    make_receipt(client, 8002)
+    make_receipt(client, 8003)
+    branch.pull()
+    before = latest_version()
+
+    backup_service.restore_snapshot(manifest['name'])
+    # Report caches are keyed on this version, so it must move forward too
+    assert latest_version() > before
+
+    make_receipt(client, 8004)
+    assert latest_version() > before + 1
+
+    # The branch cursor predates the restore: it starts over and matches the server again
+    branch.pull()
+    assert [r['number'] for r in branch.all('receipt')] == [8001, 8004]
+    assert branch.version == latest_version()
+
+
+def test_manual_backup_conflicts_with_another_worker(client):
+    # Another process holds the lock file
+    os.makedirs(backup_service.backup_dir, exist_ok=True)
+    lock_path = os.path.join(backup_service.backup_dir, LOCK_NAME)
+    with open(lock_path, 'w') as f:
+        f.write('12345')
+
+    response = client.post('/api/admin/backup')
+    assert response.status_code == 409
+    assert backup_service.list_snapshots() == []
+
+    os.remove(lock_path)
+    assert client.post('/api/admin/backup').status_code == 202
+    deadline = time.monotonic() + 10
+    while backup_service.status()['running'] or not backup_service.list_snapshots():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert backup_service.status()['lastError'] is None
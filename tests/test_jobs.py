@@ -0,0 +1,66 @@
+from src.models.user import db
+from src.models.job import Job
+from src.models.receipt import Receipt
+from src.services import job_handlers
+from src.services.jobs import job_runner
+from tests.conftest import make_receipt
+
+
+class Context:
+    """Stands in for JobContext; calls on_progress after every batch."""
+
+    def __init__(self, params, on_progress):
+        self.params = params
+        self.on_progress = on_progress
+
+    def progress(self, done, total=None, message=None):
+        self.on_progress()
+
+
+def test_cancel_queued_job(client):
+    job = client.post('/api/jobs', json={'type': 'backup'}).get_json()
+
+    result = client.post(f"/api/jobs/{job['id']}/cancel").get_json()
+    assert result['status'] == 'cancelled'
+    assert job_runner._claim(job['id']) is False
+
+
+def test_cancel_does_not_overwrite_a_claimed_job(app):
+    job = job_runner.submit('backup')
+    assert job.status == 'queued'
+
+    # Another worker claims the job after the request loaded it
+    with db.engine.begin() as conn:
+        conn.execute(db.text("UPDATE jobs SET status = 'running' WHERE id = :id"), {'id': job.id})
+
+    job_runner.cancel(job)
+    stored = db.session.get(Job, job.id)
+    assert stored.status == 'running'
+    assert stored.cancel_requested is True
+
+
+def test_bulk_approve_keeps_approvals_made_while_it_runs(client, monkeypatch):
+    monkeypatch.setattr(job_handlers, 'BATCH_SIZE', 1)
+    ids = [make_receipt(client, number)['id'] for number in (1, 2, 3)]
+
+    def approve_by_hand():
+        # Someone approves receipt 2 between the job's batches
+        if not db.session.get(Receipt, ids[1]).approved:
+            client.post(f'/api/receipts/{ids[1]}/approve', json={'approvedBy': 'boss', 'bankAmount': 99})
+            client.delete(f'/api/receipts/{ids[2]}', json={'deletedBy': 'boss'})
+
+    result = job_handlers.bulk_approve(Context({'approvedBy': 'job', 'ids': ids,
+                                                'bankAmounts': {str(ids[1]): 1}}, approve_by_hand))
+    assert result == {'approved': 1, 'skipped': 2}
+    db.session.expire_all()
+    stored = {r.id: (r.approved, r.approved_by, r.bank_amount) for r in Receipt.query}
+    assert stored == {ids[0]: (True, 'job', 100), ids[1]: (True, 'boss', 99), ids[2]: (False, None, 100)}
+
+
+def test_claim_respects_the_limit_across_workers(app):
+    first, second = job_runner.submit('backup'), job_runner.submit('backup')
+    # Both workers read one running backup slot as free; only the first claim may win
+    assert job_runner._claim(first.id, 'backup', 1) is True
+    assert job_runner._claim(second.id, 'backup', 1) is False
+    assert db.session.get(Job, second.id).status == 'queued'
+    assert job_runner._claim(second.id, 'backup', 2) is True
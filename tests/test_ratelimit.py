@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from src.models.user import db, User
+from src.services.ratelimit import RateLimiter, MemoryBackend, SharedMemoryBackend
+
+
+@pytest.fixture
+def limited(app):
+    # Near-zero refill so each bucket holds exactly its burst during the test
+    app.config['RATE_LIMITS'] = {'read': (0.001, 4)}
+    RateLimiter(app)
+    for index, branch in enumerate(['بريدة'] * 4 + ['جدة']):
+        db.session.add(User(username=f'user{index}', code=str(100 + index), password='x', role='فرعي', branch=branch))
+    db.session.commit()
+    return app
+
+
+def logged_in(app, username):
+    """A test client whose session cookie names username, as login would set it."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['username'] = username
+    return client
+
+
+def get(client, headers=None):
+    return client.get('/api/lists', headers=headers or {}).status_code
+
+
+def test_branch_bucket_comes_from_the_login(limited):
+    clients = [logged_in(limited, f'user{i}') for i in range(4)]
+    # Branch bucket is 3 x 4 tokens; four users of one branch share it
+    statuses = [get(client) for client in clients for _ in range(4)]
+    assert statuses.count(200) == 12
+    assert statuses.count(429) == 4
+
+
+def test_login_endpoint_sets_the_identity(limited):
+    client = limited.test_client()
+    response = client.post('/api/auth/login', json={'username': 'user4', 'password': 'x'})
+    assert response.status_code == 200
+    # user4 alone in its branch: its own bucket of 4, not the address bucket
+    anonymous = limited.test_client()
+    assert [get(anonymous) for _ in range(4)] == [200] * 4
+    assert [get(client) for _ in range(4)] == [200] * 4
+    assert get(client) == 429
+
+    client.post('/api/auth/logout')
+    assert get(client) == 429  # back in the (now empty) address bucket
+
+
+def test_identity_headers_are_ignored(limited):
+    client = logged_in(limited, 'user0')
+    for i in range(4):
+        assert get(client, {'X-User': f'user{i}', 'X-Branch': f'fake-{i}'}) == 200
+    assert get(client, {'X-User': 'user4', 'X-Branch': 'جدة'}) == 429
+
+
+def test_unknown_callers_share_the_address_bucket(limited):
+    anonymous = limited.test_client()
+    # A new username on every request does not buy a new bucket
+    statuses = [get(anonymous, {'X-User': f'guest{i}'}) for i in range(8)]
+    assert statuses == [200] * 4 + [429] * 4
+    # Neither does a session for a user that does not exist
+    assert get(logged_in(limited, 'nobody')) == 429
+
+
+def test_rejected_request_takes_no_user_tokens(limited):
+    for i in range(3):
+        client = logged_in(limited, f'user{i}')
+        for _ in range(4):
+            assert get(client) == 200
+    # The branch is empty: user3 is turned away without spending its own tokens
+    client = logged_in(limited, 'user3')
+    assert get(client) == 429
+    assert get(client) == 429
+
+    backend = limited.extensions['ratelimit'].backend
+    assert backend.take([('user:user3:read', 0.001, 4)], cost=4)[0]
+
+
+def test_quiet_branch_is_served_while_another_is_throttled(limited):
+    noisy = [logged_in(limited, f'user{i}') for i in range(4)]
+    statuses = [get(noisy[i % 4]) for i in range(100)]
+    quiet = logged_in(limited, 'user4')
+    assert statuses.count(200) == 12
+    assert [get(quiet) for _ in range(4)] == [200] * 4
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: MemoryBackend(),
+    lambda tmp_path: SharedMemoryBackend(str(tmp_path / 'buckets')),
+])
+def test_backend_takes_from_all_buckets_or_none(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    buckets = [('user:a', 0.001, 2), ('branch:b', 0.001, 3)]
+    assert backend.take(buckets)[0]
+    assert backend.take(buckets)[0]
+    allowed, retry_after = backend.take(buckets)
+    assert not allowed and retry_after > 0
+    # The branch bucket still holds the token the rejected request did not take
+    assert backend.take([('branch:b', 0.001, 3)])[0]
+    assert not backend.take([('branch:b', 0.001, 3)])[0]
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: MemoryBackend(),
+    lambda tmp_path: SharedMemoryBackend(str(tmp_path / 'buckets')),
+])
+def test_backend_holds_the_rate_under_concurrency(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    taken = []
+    deadline = time.monotonic() + 1
+
+    def worker(index):
+        while time.monotonic() < deadline:
+            if backend.take([(f'user:{index}', 100, 100), ('branch:b', 30, 10)])[0]:
+                taken.append(1)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Burst of 10 plus one second at 30/s, with a little slack for timing
+    assert 35 <= len(taken) <= 45
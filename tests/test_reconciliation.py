@@ -0,0 +1,99 @@
+from src.models.receipt import db, Receipt
+from tests.conftest import make_receipt
+
+
+def statement_csv(*lines):
+    return 'date,amount,reference\n' + '\n'.join(f'{date},{amount},{reference}' for date, amount, reference in lines)
+
+
+def import_csv(client, text):
+    return client.post('/api/reconciliation/statements', json={'bank': 'الراجحي', 'csv': text})
+
+
+def match(client, statement_id):
+    return client.post(f'/api/reconciliation/statements/{statement_id}/match').get_json()
+
+
+def test_exact_and_split_matches_are_approved(client):
+    make_receipt(client, 1, amount=100)
+    make_receipt(client, 2, amount=40, branch='جدة')
+    make_receipt(client, 3, amount=60, branch='جدة')
+    statement = import_csv(client, statement_csv(('2025-03-01', 100, 'A1'), ('2025-03-02', 100, 'A2'))).get_json()
+
+    assert match(client, statement['id']) == {'lines': 2, 'exact': 1, 'split': 1, 'unmatched': 0}
+    result = client.post('/api/reconciliation/approve', json={'approvedBy': 'rec', 'statementId': statement['id']}).get_json()
+
+    assert result == {'approved': 3, 'skipped': 0}
+    assert {r.number: r.approved_by for r in Receipt.query} == {1: 'rec', 2: 'rec', 3: 'rec'}
+
+
+def test_approved_receipts_are_not_candidates(client):
+    receipt = make_receipt(client, 1, amount=100)
+    client.post(f"/api/receipts/{receipt['id']}/approve", json={'approvedBy': 'boss', 'bankAmount': 99})
+    statement = import_csv(client, statement_csv(('2025-03-01', 100, 'A1'))).get_json()
+
+    assert match(client, statement['id'])['exact'] == 0
+    stored = db.session.get(Receipt, receipt['id'])
+    assert (stored.approved_by, stored.bank_amount) == ('boss', 99)
+
+
+def test_approval_skips_receipts_approved_after_matching(client):
+    receipt = make_receipt(client, 1, amount=100)
+    statement = import_csv(client, statement_csv(('2025-03-01', 100, 'A1'))).get_json()
+    assert match(client, statement['id'])['exact'] == 1
+
+    client.post(f"/api/receipts/{receipt['id']}/approve", json={'approvedBy': 'boss', 'bankAmount': 99})
+    result = client.post('/api/reconciliation/approve', json={'approvedBy': 'rec', 'statementId': statement['id']}).get_json()
+
+    assert result == {'approved': 0, 'skipped': 1}
+    db.session.expire_all()
+    stored = db.session.get(Receipt, receipt['id'])
+    assert (stored.approved_by, stored.bank_amount) == ('boss', 99)
+    lines = client.get(f"/api/reconciliation/statements/{statement['id']}/lines").get_json()['lines']
+    assert lines[0]['status'] == 'unmatched'
+
+
+def test_rejected_pair_is_not_proposed_again(client):
+    make_receipt(client, 1, amount=100, date='2025-03-01')
+    make_receipt(client, 2, amount=100, date='2025-03-03')
+    statement = import_csv(client, statement_csv(('2025-03-01', 100, 'A1'))).get_json()
+    lines_url = f"/api/reconciliation/statements/{statement['id']}/lines"
+
+    match(client, statement['id'])
+    line = client.get(lines_url).get_json()['lines'][0]
+    assert [m['receiptNumber'] for m in line['matches']] == [1]
+
+    assert client.post(f"/api/reconciliation/lines/{line['id']}/reject").get_json()['rejected'] == 1
+    match(client, statement['id'])
+    line = client.get(lines_url).get_json()['lines'][0]
+    proposed = [m['receiptNumber'] for m in line['matches'] if m['status'] == 'proposed']
+    assert proposed == [2]
+
+    client.post(f"/api/reconciliation/lines/{line['id']}/reject")
+    assert match(client, statement['id'])['unmatched'] == 1
+
+
+def test_rejected_split_is_not_proposed_again(client):
+    make_receipt(client, 1, amount=40)
+    make_receipt(client, 2, amount=60)
+    statement = import_csv(client, statement_csv(('2025-03-01', 100, 'A1'))).get_json()
+
+    assert match(client, statement['id'])['split'] == 1
+    line = client.get(f"/api/reconciliation/statements/{statement['id']}/lines").get_json()['lines'][0]
+    client.post(f"/api/reconciliation/lines/{line['id']}/reject")
+    assert match(client, statement['id'])['unmatched'] == 1
+
+
+def test_reimported_statement_is_rejected(client):
+    text = statement_csv(('2025-03-01', 100, 'A1'), ('2025-03-01', 100, 'A1'), ('2025-03-02', 50, 'A2'))
+    first = import_csv(client, text)
+    assert first.status_code == 201
+    assert (first.get_json()['lineCount'], first.get_json()['duplicatesSkipped']) == (3, 0)
+
+    again = import_csv(client, text)
+    assert again.status_code == 400
+    assert again.get_json()['error'] == 'Statement was already imported'
+
+    # An overlapping statement only adds the lines not seen before
+    overlap = import_csv(client, statement_csv(('2025-03-02', 50, 'A2'), ('2025-03-03', 75, 'A3'))).get_json()
+    assert (overlap['lineCount'], overlap['duplicatesSkipped']) == (1, 1)
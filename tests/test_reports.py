@@ -0,0 +1,95 @@
+import pytest
+
+from src.services import analytics
+from tests.conftest import make_receipt
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    # Every test database starts again at change_log version 1, so keys would collide
+    analytics._cache.clear()
+
+
+def report(client, **args):
+    response = client.get('/api/reports/collections', query_string=args)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def add(client, *receipts):
+    for number, (day, amount, branch) in enumerate(receipts, start=1):
+        make_receipt(client, number, date=day, amount=amount, branch=branch)
+
+
+def test_month_over_month(client):
+    add(client, ('2025-01-10', 100, 'الرياض'), ('2025-02-03', 150, 'الرياض'), ('2025-02-20', 50, 'جدة'))
+    result = report(client, period='month', date_to='2025-03-31')
+
+    assert result['periods'] == ['2025-01', '2025-02', '2025-03']
+    totals = result['totals']
+    assert totals['amounts'] == [100, 200, 0]
+    assert totals['counts'] == [1, 2, 0]
+    assert totals['previous'] == [0, 100, 200]
+    assert totals['delta'] == [100, 100, -200]
+    assert totals['deltaPct'] == [None, 100.0, -100.0]
+    assert [s['name'] for s in result['series']] == ['الرياض', 'جدة']
+    assert result['series'][1]['amounts'] == [0, 50, 0]
+
+
+def test_date_from_compares_with_the_period_before_it(client):
+    add(client, ('2024-12-31', 40, 'الرياض'), ('2025-01-01', 60, 'الرياض'), ('2025-02-15', 90, 'الرياض'))
+    result = report(client, period='month', date_from='2025-02-01')
+
+    # December only fed the query widening for January, which is outside the range
+    assert result['periods'] == ['2025-02']
+    assert result['totals']['amounts'] == [90]
+    assert result['totals']['previous'] == [60]
+
+    result = report(client, period='day', date_from='2025-01-01', date_to='2025-01-02')
+    assert result['periods'] == ['2025-01-01', '2025-01-02']
+    assert result['totals']['previous'] == [40, 60]
+
+
+def test_year_over_year(client):
+    add(client, ('2024-03-05', 80, 'الرياض'), ('2025-03-09', 120, 'الرياض'), ('2025-01-02', 10, 'الرياض'))
+    result = report(client, period='month', compare='year', date_from='2025-01-01', date_to='2025-03-31')
+
+    assert result['periods'] == ['2025-01', '2025-02', '2025-03']
+    assert result['totals']['previous'] == [0, 0, 80]
+    assert result['totals']['deltaPct'] == [None, None, 50.0]
+
+
+def test_daily_year_over_year_matches_calendar_days(client):
+    add(client, ('2023-02-28', 10, 'الرياض'), ('2023-03-01', 20, 'الرياض'),
+        ('2024-02-29', 30, 'الرياض'), ('2024-03-01', 40, 'الرياض'))
+    result = report(client, period='day', compare='year', date_from='2024-02-28', date_to='2024-03-01')
+
+    assert result['periods'] == ['2024-02-28', '2024-02-29', '2024-03-01']
+    # 29 February compares with the 28th; 1 March with 1 March, not 365 days back
+    assert result['totals']['previous'] == [10, 10, 20]
+
+
+def test_without_comparison(client):
+    add(client, ('2025-01-10', 100, 'الرياض'))
+    result = report(client, period='year', compare='none')
+    assert result['periods'] == ['2025']
+    assert result['totals']['previous'] is None
+    assert result['series'][0]['delta'] is None
+
+
+def test_empty_range(client):
+    add(client, ('2025-01-10', 100, 'الرياض'))
+    result = report(client, date_from='2030-01-01')
+    assert result['periods'] == [] and result['series'] == [] and result['totals'] is None
+
+
+def test_receipt_write_invalidates_the_cache(client):
+    add(client, ('2025-01-10', 100, 'الرياض'))
+    first = analytics.collections_report(filters={'date_to': '2025-01-31'})
+    assert analytics.collections_report(filters={'date_to': '2025-01-31'}) is first
+
+    make_receipt(client, 2, date='2025-01-11', amount=25)
+    assert report(client, date_to='2025-01-31')['totals']['amounts'] == [125]
+
+    client.put('/api/receipts/2', json={'bankAmount': 5}, headers={'X-User': 'admin'})
+    assert report(client, date_to='2025-01-31')['totals']['amounts'] == [105]
@@ -0,0 +1,189 @@
+from src.models.receipt import db, Receipt
+from src.models.sync import seed_change_log
+from src.services.sync_node import BranchNode, FlaskTransport
+from tests.conftest import make_receipt
+
+
+def receipt_data(number, **fields):
+    data = {
+        'number': number,
+        'clientName': 'عميل',
+        'amount': 100,
+        'bankAmount': 100,
+        'method': 'تحويل بنكي',
+        'bank': 'الراجحي',
+        'reason': 'سداد فواتير',
+        'branch': 'بريدة',
+        'createdBy': 'user1',
+        'date': '2025-03-01',
+        'updatedAt': '2025-03-01T08:00:00',
+    }
+    data.update(fields)
+    return data
+
+
+def branches(client):
+    transport = FlaskTransport(client)
+    return BranchNode('branch-a', transport), BranchNode('branch-b', transport)
+
+
+def test_insert_reaches_other_branch(client):
+    a, b = branches(client)
+    a.save('receipt', 5001, receipt_data(5001))
+    assert a.sync()['applied'] == 1
+    assert a.pending() == 0
+
+    b.pull()
+    assert b.get('receipt', 5001)['clientName'] == 'عميل'
+    assert Receipt.query.filter_by(number=5001).count() == 1
+
+
+def test_pull_keeps_own_newer_write(client):
+    a, b = branches(client)
+    make_receipt(client, 5002)
+    a.pull()
+    b.pull()
+
+    b.save('receipt', 5002, dict(b.get('receipt', 5002), amount=200, updatedAt='2030-01-01T00:00:00'))
+    b.push()
+    a.save('receipt', 5002, dict(a.get('receipt', 5002), amount=300, updatedAt='2030-01-02T00:00:00'))
+    assert a.push()['conflicts'] == []
+
+    a.pull()
+    b.pull()
+    assert Receipt.query.filter_by(number=5002).one().amount == 300
+    assert a.get('receipt', 5002)['amount'] == 300
+    assert b.get('receipt', 5002)['amount'] == 300
+
+
+def test_stale_update_gives_way_to_server(client):
+    a, b = branches(client)
+    make_receipt(client, 5003)
+    a.pull()
+    b.pull()
+
+    b.save('receipt', 5003, dict(b.get('receipt', 5003), amount=200, updatedAt='2030-01-02T00:00:00'))
+    b.push()
+    a.save('receipt', 5003, dict(a.get('receipt', 5003), amount=300, updatedAt='2030-01-01T00:00:00'))
+    result = a.push()
+
+    assert [c['reason'] for c in result['conflicts']] == ['stale']
+    assert a.get('receipt', 5003)['amount'] == 200
+
+
+def test_approved_receipt_is_final(client):
+    a, _ = branches(client)
+    receipt = make_receipt(client, 5004)
+    a.pull()
+    client.post(f"/api/receipts/{receipt['id']}/approve", json={'approvedBy': 'admin'})
+
+    a.save('receipt', 5004, dict(a.get('receipt', 5004), amount=1))
+    result = a.push()
+    assert [c['reason'] for c in result['conflicts']] == ['approved']
+    assert a.get('receipt', 5004)['approved'] is True
+
+    a.delete('receipt', 5004)
+    assert [c['reason'] for c in a.push()['conflicts']] == ['approved']
+
+
+def test_duplicate_insert_is_rejected(client):
+    a, b = branches(client)
+    a.save('receipt', 5005, receipt_data(5005, amount=1))
+    b.save('receipt', 5005, receipt_data(5005, amount=2))
+    a.push()
+    result = b.push()
+
+    assert [c['reason'] for c in result['conflicts']] == ['duplicate']
+    assert b.get('receipt', 5005)['amount'] == 1
+
+
+def test_soft_delete_replicates_as_delete(client):
+    a, _ = branches(client)
+    receipt = make_receipt(client, 5006)
+    a.pull()
+    client.delete(f"/api/receipts/{receipt['id']}", headers={'X-User': 'admin'})
+
+    a.pull()
+    assert a.get('receipt', 5006) is None
+
+    a.save('receipt', 5006, receipt_data(5006))
+    assert [c['reason'] for c in a.push()['conflicts']] == ['deleted']
+
+
+def test_feed_compacts_to_newest_change_per_row(client):
+    receipt = make_receipt(client, 5007)
+    for amount in (110, 120, 130):
+        client.put(f"/api/receipts/{receipt['id']}", json={'amount': amount}, headers={'X-User': 'admin'})
+
+    result = client.get('/api/sync/changes', query_string={'since': 0}).get_json()
+    assert [(c['key'], c['op']) for c in result['changes']] == [('5007', 'update')]
+    assert result['changes'][0]['data']['amount'] == 130
+    assert result['hasMore'] is False
+
+
+def test_feed_pages_with_has_more(client):
+    for number in range(6001, 6006):
+        make_receipt(client, number)
+    first = Receipt.query.filter_by(number=6001).one()
+    client.put(f'/api/receipts/{first.id}', json={'amount': 999}, headers={'X-User': 'admin'})
+
+    since, pages, received = 0, 0, {}
+    while True:
+        result = client.get('/api/sync/changes', query_string={'since': since, 'limit': 2}).get_json()
+        pages += 1
+        for change in result['changes']:
+            # A row is only sent once, with its newest data
+            assert change['key'] not in received
+            received[change['key']] = change['data']['amount']
+        since = result['version']
+        if not result['hasMore']:
+            break
+
+    assert pages == 3
+    assert received == {'6001': 999, '6002': 100, '6003': 100, '6004': 100, '6005': 100}
+
+
+def test_seed_logs_rows_written_outside_the_session(client):
+    a, _ = branches(client)
+    db.session.execute(db.text(
+        "INSERT INTO receipts (number, client_name, amount, method, bank, reason, branch, created_by, date, approved) "
+        "VALUES (7001, 'قديم', 50, 'نقداً', 'الراجحي', 'سداد فواتير', 'الرياض', 'admin', '2024-01-01', 0)"
+    ))
+    db.session.commit()
+    assert a.pull() == 0
+
+    assert seed_change_log() == 1
+    assert seed_change_log() == 0
+    assert a.pull() == 1
+    assert a.get('receipt', 7001)['clientName'] == 'قديم'
+
+
+def test_branch_cannot_approve_or_set_the_bank_amount(client):
+    a, _ = branches(client)
+    a.save('receipt', 5201, receipt_data(5201, approved=True, approvedBy='branch', approvedAt='2025-03-01T09:00:00',
+                                         bankAmount=1))
+    assert a.push()['applied'] == 1
+    stored = Receipt.query.filter_by(number=5201).one()
+    assert (stored.approved, stored.approved_by, stored.approved_at, stored.bank_amount) == (False, None, None, 100)
+
+    a.save('receipt', 5201, receipt_data(5201, amount=150, approved=True, approvedBy='branch', bankAmount=1,
+                                         updatedAt='2025-03-02T08:00:00'))
+    assert a.push()['applied'] == 1
+    db.session.expire_all()
+    stored = Receipt.query.filter_by(number=5201).one()
+    assert (stored.amount, stored.approved, stored.approved_by, stored.bank_amount) == (150, False, None, 100)
+
+
+def test_invalid_changes_do_not_block_the_outbox(client):
+    a, _ = branches(client)
+    a.save('receipt', 5301, receipt_data(5301))
+    a.save('receipt', 'abc', receipt_data(5302))
+    a.save('receipt', 5303, {'number': 5303, 'amount': 10})  # missing required columns
+    a.save('receipt', 5304, receipt_data(5304))
+
+    result = a.push()
+    assert result['applied'] == 2
+    assert [(c['key'], c['reason']) for c in result['conflicts']] == [('abc', 'invalid'), ('5303', 'invalid')]
+    assert a.pending() == 0
+    assert sorted(number for (number,) in db.session.query(Receipt.number)) == [5301, 5304]
+    assert {c['key'] for c in client.get('/api/sync/changes').get_json()['changes']} == {'5301', '5304'}